@@ -45,6 +45,13 @@ def _get_path():
     return join(_home, '.databrickscfg')
 
 
+def get_state_dir():
+    """
+    Returns the directory in which the CLI keeps local state between runs.
+    """
+    return join(_home, '.databricks-cli')
+
+
 def _fetch_from_fs():
     raw_config = ConfigParser()
     raw_config.read(_get_path())
@@ -24,16 +24,36 @@
 from base64 import b64encode, b64decode
 
 import os
+import time
+
 import click
 
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from requests.exceptions import HTTPError
 
 from databricks_cli.sdk import DbfsService
 from databricks_cli.utils import error_and_quit
+from databricks_cli.dbfs.artifacts import ArtifactIndex, artifact_path, \
+    ARTIFACT_INDEX_FILE_NAME, DEFAULT_ARTIFACT_ROOT
 from databricks_cli.dbfs.dbfs_path import DbfsPath
-from databricks_cli.dbfs.exceptions import LocalFileExistsException
+from databricks_cli.dbfs.exceptions import LocalFileExistsException, TransferFailedException
+from databricks_cli.dbfs.plan import UploadPlan
+from databricks_cli.dbfs.streams import DbfsReader, DbfsWriter, read_range
+from databricks_cli.dbfs.sync import SyncManifest, hash_file
+from databricks_cli.dbfs.transfer import TransferResult, ByteBudget, PositionalFile, \
+    MappedFile, DownloadCheckpoint, SizeAwareScheduler, TransferJournal, run_in_parallel, \
+    prefetch, add_block_body, crawl, report_transfers, run_windowed, BUFFERED_IO, MMAP_IO, \
+    IO_BACKENDS, DEFAULT_PARALLELISM, DEFAULT_MAX_BYTES_IN_FLIGHT, DEFAULT_LIST_PARALLELISM
 
 BUFFER_SIZE_BYTES = 2**20
+# Number of encoded blocks read ahead of the block being uploaded by put_file.
+UPLOAD_PIPELINE_DEPTH = 4
+# DbfsService.put accepts at most 1 MB of inline contents. Files whose base64 encoding fits are
+# uploaded with a single put instead of create, add_block and close.
+SMALL_FILE_THRESHOLD_BYTES = 3 * 2**18
+TAIL_POLL_INTERVAL_SECONDS = 1.0
+# cp reads from stdin or writes to stdout when given this path.
+STDIO_PATH = '-'
 
 
 class FileInfo(object):
@@ -42,8 +62,13 @@ class FileInfo(object):
         self.is_dir = is_dir
         self.file_size = file_size
 
-    def to_row(self, is_long_form, is_absolute):
-        path = self.dbfs_path.absolute_path if is_absolute else self.dbfs_path.basename
+    def to_row(self, is_long_form, is_absolute, relative_to=None):
+        if is_absolute:
+            path = self.dbfs_path.absolute_path
+        elif relative_to is not None:
+            path = self.dbfs_path.relpath(relative_to)
+        else:
+            path = self.dbfs_path.basename
         stylized_path = click.style(path, 'cyan') if self.is_dir else path
         if is_long_form:
             filetype = 'dir' if self.is_dir else 'file'
@@ -63,14 +88,47 @@ class FileInfo(object):
         return False
 
 
+class _DiskUsageNode(object):
+    def __init__(self, dbfs_path, parent, depth):
+        self.dbfs_path = dbfs_path
+        self.parent = parent
+        self.depth = depth
+        self.total_bytes = 0
+        # Child directories whose subtree is not fully listed yet, plus this node's own listing.
+        self.pending = 1
+
+
 class DbfsErrorCodes(object):
     RESOURCE_DOES_NOT_EXIST = 'RESOURCE_DOES_NOT_EXIST'
     RESOURCE_ALREADY_EXISTS = 'RESOURCE_ALREADY_EXISTS'
 
 
+def _already_exists_message(_src, dst, e):
+    if isinstance(e, HTTPError) and \
+            e.response.json()['error_code'] == DbfsErrorCodes.RESOURCE_ALREADY_EXISTS:
+        return '{} already exists. Skip.'.format(dst)
+    return None
+
+
+def _local_exists_message(src, dst, e):
+    if isinstance(e, LocalFileExistsException):
+        return ('{} already exists locally as {}. Skip. To overwrite, you should provide the '
+                '--overwrite flag.').format(src, dst)
+    return None
+
+
 class DbfsApi(object):
-    def __init__(self, api_client):
+    """
+    ``io_backend`` selects how large local files are read and written. BUFFERED_IO uses read and
+    write calls. MMAP_IO maps the local file instead: uploads encode blocks straight from the
+    mapping and parallel downloads fill a preallocated mapping in place.
+    """
+    def __init__(self, api_client, io_backend=BUFFERED_IO):
+        if io_backend not in IO_BACKENDS:
+            raise ValueError('Unknown I/O backend {}. Expected one of {}.'.format(
+                io_backend, ', '.join(IO_BACKENDS)))
         self.client = DbfsService(api_client)
+        self.io_backend = io_backend
 
     def list_files(self, dbfs_path):
         list_response = self.client.list(dbfs_path.absolute_path)
@@ -79,6 +137,61 @@ class DbfsApi(object):
         else:
             return []
 
+    def walk(self, dbfs_path, parallelism=DEFAULT_LIST_PARALLELISM):
+        """
+        Yields the FileInfo of everything under dbfs_path, listing directories concurrently. A
+        directory is always yielded before its children.
+        """
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            pending = set([executor.submit(self.list_files, dbfs_path)])
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for file_info in future.result():
+                            if file_info.is_dir:
+                                pending.add(executor.submit(self.list_files,
+                                                            file_info.dbfs_path))
+                            yield file_info
+            finally:
+                # The caller may stop iterating early, so drop listings that have not started.
+                for future in pending:
+                    future.cancel()
+
+    def disk_usage(self, dbfs_path, max_depth=None, parallelism=DEFAULT_LIST_PARALLELISM):
+        """
+        Yields ``(DbfsPath, total_bytes)`` for dbfs_path and each directory at most max_depth levels
+        below it, as soon as its subtree has been listed.
+        """
+        root = _DiskUsageNode(dbfs_path, None, 0)
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            pending = {executor.submit(self.list_files, dbfs_path): root}
+            try:
+                while pending:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node = pending.pop(future)
+                        for file_info in future.result():
+                            if file_info.is_dir:
+                                child = _DiskUsageNode(file_info.dbfs_path, node, node.depth + 1)
+                                node.pending += 1
+                                pending[executor.submit(self.list_files,
+                                                        file_info.dbfs_path)] = child
+                            else:
+                                node.total_bytes += file_info.file_size
+                        # The listing of this node itself is done.
+                        node.pending -= 1
+                        while node is not None and node.pending == 0:
+                            if max_depth is None or node.depth <= max_depth:
+                                yield node.dbfs_path, node.total_bytes
+                            if node.parent is not None:
+                                node.parent.total_bytes += node.total_bytes
+                                node.parent.pending -= 1
+                            node = node.parent
+            finally:
+                for future in pending:
+                    future.cancel()
+
     def file_exists(self, dbfs_path):
         try:
             self.get_status(dbfs_path)
@@ -92,32 +205,196 @@ class DbfsApi(object):
         json = self.client.get_status(dbfs_path.absolute_path)
         return FileInfo.from_json(json)
 
+    def open(self, dbfs_path, mode='rb', overwrite=False):
+        """
+        Opens the DBFS file at dbfs_path as a DbfsReader in mode ``rb`` or a DbfsWriter in mode
+        ``wb``.
+        """
+        if mode == 'rb':
+            file_info = self.get_status(dbfs_path)
+            if file_info.is_dir:
+                raise IOError('The dbfs file {} is a directory.'.format(dbfs_path.absolute_path))
+            return DbfsReader(self.client, dbfs_path, file_info.file_size)
+        if mode == 'wb':
+            return DbfsWriter(self.client, dbfs_path, overwrite)
+        raise ValueError('Unsupported mode {}. Expected rb or wb.'.format(mode))
+
     def put_file(self, src_path, dbfs_path, overwrite):
+        """
+        Small files are sent with a single put. Larger ones are read and encoded ahead of the
+        add_block request in flight.
+        """
+        file_size = os.path.getsize(src_path)
+        if file_size <= SMALL_FILE_THRESHOLD_BYTES:
+            with open(src_path, 'rb') as local_file:
+                contents = b64encode(local_file.read()).decode()
+            self.client.put(dbfs_path.absolute_path, contents, overwrite)
+            return
         handle = self.client.create(dbfs_path.absolute_path, overwrite)['handle']
-        with open(src_path, 'rb') as local_file:
-            while True:
-                contents = local_file.read(BUFFER_SIZE_BYTES)
-                if len(contents) == 0:
-                    break
-                # add_block should not take a bytes object.
-                self.client.add_block(handle, b64encode(contents).decode())
+        if self.io_backend == MMAP_IO:
+            local_file = MappedFile(src_path)
+            blocks = local_file.blocks(BUFFER_SIZE_BYTES)
+        else:
+            local_file = open(src_path, 'rb')
+            blocks = self._read_blocks(local_file)
+        with local_file:
+            bodies = self._add_block_bodies(blocks, handle)
+            if file_size > BUFFER_SIZE_BYTES:
+                bodies = prefetch(bodies, UPLOAD_PIPELINE_DEPTH)
+            try:
+                for body in bodies:
+                    self.client.add_block_raw(body)
+            finally:
+                bodies.close()
             self.client.close(handle)
 
-    def get_file(self, dbfs_path, dst_path, overwrite):
-        if os.path.exists(dst_path) and not overwrite:
+    @staticmethod
+    def _read_blocks(local_file):
+        """
+        Yields views of the blocks of local_file, all read into one reused buffer.
+        """
+        buf = bytearray(BUFFER_SIZE_BYTES)
+        view = memoryview(buf)
+        while True:
+            num_bytes = local_file.readinto(buf)
+            if not num_bytes:
+                break
+            yield view[:num_bytes]
+
+    @staticmethod
+    def _add_block_bodies(blocks, handle):
+        try:
+            for block in blocks:
+                yield add_block_body(handle, block)
+        finally:
+            blocks.close()
+
+    def get_file(self, dbfs_path, dst_path, overwrite, parallelism=DEFAULT_PARALLELISM,
+                 resume=False, file_info=None):
+        """
+        Pass file_info to skip the get_status request. With resume, a download interrupted earlier
+        continues from its ``.partial`` checkpoint.
+        """
+        exists = os.path.exists(dst_path) and not overwrite
+        if exists and not (resume and DownloadCheckpoint.exists_for(dst_path)):
             raise LocalFileExistsException('{} exists already.'.format(dst_path))
-        file_info = self.get_status(dbfs_path)
+        if file_info is None:
+            file_info = self.get_status(dbfs_path)
         if file_info.is_dir:
             error_and_quit(('The dbfs file {} is a directory.').format(repr(dbfs_path)))
         length = file_info.file_size
-        offset = 0
-        with open(dst_path, 'wb') as local_file:
-            while offset < length:
-                response = self.client.read(dbfs_path.absolute_path, offset, BUFFER_SIZE_BYTES)
-                bytes_read = response['bytes_read']
-                data = response['data']
-                offset += bytes_read
-                local_file.write(b64decode(data))
+        checkpoint = DownloadCheckpoint(dst_path, dbfs_path.absolute_path, length)
+        offset = checkpoint.load_offset() if resume else 0
+        # Only a checkpoint of this very download may take over an existing file.
+        if exists and offset == 0:
+            raise LocalFileExistsException('{} exists already.'.format(dst_path))
+        if parallelism > 1 and length > BUFFER_SIZE_BYTES:
+            self._get_file_ranged(dbfs_path, dst_path, length, parallelism, checkpoint, offset)
+        else:
+            with open(dst_path, 'r+b' if offset > 0 else 'wb') as local_file:
+                local_file.seek(offset)
+                local_file.truncate()
+                while offset < length:
+                    response = self.client.read(dbfs_path.absolute_path, offset,
+                                                BUFFER_SIZE_BYTES)
+                    bytes_read = response['bytes_read']
+                    if bytes_read == 0:
+                        raise IOError('Unexpected end of file {} at offset {}'.format(
+                            dbfs_path.absolute_path, offset))
+                    data = response['data']
+                    offset += bytes_read
+                    local_file.write(b64decode(data))
+                    if length > BUFFER_SIZE_BYTES:
+                        local_file.flush()
+                        checkpoint.save(offset)
+        checkpoint.remove()
+
+    def _get_file_ranged(self, dbfs_path, dst_path, length, parallelism, checkpoint,
+                         start_offset=0):
+        file_class = MappedFile if self.io_backend == MMAP_IO else PositionalFile
+        with file_class(dst_path, length, keep_contents=start_offset > 0) as local_file:
+            # Ranges complete out of order. The checkpoint only advances past a range once
+            # every range before it has been written.
+            completed = set()
+            contiguous_offset = start_offset
+            # At most 2 * parallelism ranges are queued or in flight, which keeps memory use
+            # flat no matter how large the file is.
+            for start in run_windowed(
+                    lambda start: self._fetch_range(dbfs_path, local_file, start, length),
+                    range(start_offset, length, BUFFER_SIZE_BYTES), parallelism, 2 * parallelism):
+                completed.add(start)
+                if contiguous_offset in completed:
+                    while contiguous_offset in completed:
+                        completed.remove(contiguous_offset)
+                        contiguous_offset = min(contiguous_offset + BUFFER_SIZE_BYTES, length)
+                    local_file.flush()
+                    checkpoint.save(contiguous_offset)
+
+    def _fetch_range(self, dbfs_path, local_file, start, length):
+        end = min(start + BUFFER_SIZE_BYTES, length)
+        offset = start
+        while offset < end:
+            response = self.client.read(dbfs_path.absolute_path, offset, end - offset)
+            if response['bytes_read'] == 0:
+                raise IOError('Unexpected end of file {} at offset {}'.format(
+                    dbfs_path.absolute_path, offset))
+            local_file.write_at(offset, b64decode(response['data']))
+            offset += response['bytes_read']
+
+    def _get_file_size(self, dbfs_path):
+        file_info = self.get_status(dbfs_path)
+        if file_info.is_dir:
+            error_and_quit(('The dbfs file {} is a directory.').format(repr(dbfs_path)))
+        return file_info.file_size
+
+    def _write_range(self, dbfs_path, out, start, end):
+        """
+        Writes bytes ``[start, end)`` of the DBFS file to ``out``.
+        """
+        if end - start <= BUFFER_SIZE_BYTES:
+            out.write(read_range(self.client, dbfs_path.absolute_path, start, end))
+            return
+        with DbfsReader(self.client, dbfs_path, end, BUFFER_SIZE_BYTES) as reader:
+            reader.seek(start)
+            while True:
+                data = reader.read1()
+                if not data:
+                    break
+                out.write(data)
+
+    def cat(self, dbfs_path, out):
+        """
+        Writes the contents of the DBFS file at dbfs_path to the binary stream ``out``.
+        """
+        self._write_range(dbfs_path, out, 0, self._get_file_size(dbfs_path))
+
+    def head(self, dbfs_path, out, num_bytes):
+        """
+        Writes the first num_bytes bytes of the DBFS file at dbfs_path to ``out``.
+        """
+        length = self._get_file_size(dbfs_path)
+        self._write_range(dbfs_path, out, 0, min(num_bytes, length))
+
+    def tail(self, dbfs_path, out, num_bytes, follow=False,
+             poll_interval=TAIL_POLL_INTERVAL_SECONDS):
+        """
+        Writes the last num_bytes bytes of the DBFS file at dbfs_path to ``out``. With follow,
+        appended bytes are written as they appear, until interrupted.
+        """
+        length = self._get_file_size(dbfs_path)
+        offset = max(0, length - num_bytes)
+        while True:
+            if length < offset:
+                click.echo('{}: file truncated'.format(dbfs_path.absolute_path), err=True)
+                offset = 0
+            if length > offset:
+                self._write_range(dbfs_path, out, offset, length)
+                out.flush()
+                offset = length
+            if not follow:
+                return
+            time.sleep(poll_interval)
+            length = self._get_file_size(dbfs_path)
 
     def delete(self, dbfs_path, recursive):
         self.client.delete(dbfs_path.absolute_path, recursive=recursive)
@@ -140,87 +417,464 @@ class DbfsApi(object):
                 raise e
         self.put_file(src, dbfs_path_dst, overwrite)
 
-    def _copy_from_dbfs_non_recursive(self, dbfs_path_src, dst, overwrite):
+    def _copy_from_dbfs_non_recursive(self, dbfs_path_src, dst, overwrite,
+                                      parallelism=DEFAULT_PARALLELISM, resume=False):
         # Munge dst path in case dst is a dir
         if os.path.isdir(dst):
             dst = os.path.join(dst, dbfs_path_src.basename)
-        self.get_file(dbfs_path_src, dst, overwrite)
+        self.get_file(dbfs_path_src, dst, overwrite, parallelism, resume)
 
-    def _copy_to_dbfs_recursive(self, src, dbfs_path_dst, overwrite):
+    def _copy_within_dbfs_non_recursive(self, dbfs_path_src, dbfs_path_dst, overwrite,
+                                        file_info):
+        # Munge dst path in case dbfs_path_dst is a dir
         try:
-            self.mkdirs(dbfs_path_dst)
+            if self.get_status(dbfs_path_dst).is_dir:
+                dbfs_path_dst = dbfs_path_dst.join(dbfs_path_src.basename)
         except HTTPError as e:
-            if e.response.json()['error_code'] == DbfsErrorCodes.RESOURCE_ALREADY_EXISTS:
-                click.echo(e.response.json())
-                return
-        for filename in os.listdir(src):
-            cur_src = os.path.join(src, filename)
-            cur_dbfs_dst = dbfs_path_dst.join(filename)
-            if os.path.isdir(cur_src):
-                self._copy_to_dbfs_recursive(cur_src, cur_dbfs_dst, overwrite)
-            elif os.path.isfile(cur_src):
-                try:
-                    self.put_file(cur_src, cur_dbfs_dst, overwrite)
-                    click.echo('{} -> {}'.format(cur_src, cur_dbfs_dst))
-                except HTTPError as e:
-                    if e.response.json()['error_code'] == DbfsErrorCodes.RESOURCE_ALREADY_EXISTS:
-                        click.echo('{} already exists. Skip.'.format(cur_dbfs_dst))
-                    else:
-                        raise e
-
-    def _copy_from_dbfs_recursive(self, dbfs_path_src, dst, overwrite):
-        if os.path.isfile(dst):
-            click.echo(
-                '{} exists as a file. Skipping this subtree {}'.format(dst, repr(dbfs_path_src)))
+            if e.response.json()['error_code'] != DbfsErrorCodes.RESOURCE_DOES_NOT_EXIST:
+                raise e
+        self.copy_file(dbfs_path_src, dbfs_path_dst, overwrite, file_info)
+
+    def plan_upload(self, src, dbfs_path_dst, overwrite):
+        """
+        Returns the UploadPlan for copying the local tree at src to dbfs_path_dst.
+        """
+        dirs, files = self._walk_local_tree(src, dbfs_path_dst)
+        remote = {}
+        try:
+            root_info = self.get_status(dbfs_path_dst)
+        except HTTPError as e:
+            if e.response.json()['error_code'] != DbfsErrorCodes.RESOURCE_DOES_NOT_EXIST:
+                raise e
+            root_info = None
+        if root_info is not None:
+            remote[dbfs_path_dst.absolute_path] = root_info
+            if root_info.is_dir:
+                for file_info in self.walk(dbfs_path_dst):
+                    remote[file_info.dbfs_path.absolute_path] = file_info
+        return UploadPlan.build(dirs, files, remote, overwrite)
+
+    def _copy_to_dbfs_recursive(self, src, dbfs_path_dst, overwrite,
+                                parallelism=DEFAULT_PARALLELISM, resume=False, dry_run=False):
+        """
+        With resume, files recorded in the TransferJournal by an earlier run are not uploaded again.
+        """
+        plan = self.plan_upload(src, dbfs_path_dst, overwrite)
+        if dry_run:
+            for operation in plan.operations:
+                click.echo(operation.to_line())
             return
-        elif not os.path.isdir(dst):
-            os.makedirs(dst)
-
-        for dbfs_src_file_info in self.list_files(dbfs_path_src):
-            cur_dbfs_src = dbfs_src_file_info.dbfs_path
-            cur_dst = os.path.join(dst, cur_dbfs_src.basename)
-            if dbfs_src_file_info.is_dir:
-                self._copy_from_dbfs_recursive(cur_dbfs_src, cur_dst, overwrite)
+        for operation in plan.skips:
+            click.echo('{} {}. Skip.'.format(operation.dst, operation.reason))
+
+        for _, _, e in run_in_parallel(lambda op: self.mkdirs(op.dst), plan.mkdirs, parallelism):
+            if e is not None:
+                raise e
+
+        journal = TransferJournal(os.path.abspath(src), dbfs_path_dst.absolute_path, resume)
+        puts = [op for op in plan.puts if not journal.is_completed(op.dst.absolute_path)]
+        if len(puts) < len(plan.puts):
+            click.echo('Skipping {} files copied by a previous run.'.format(
+                len(plan.puts) - len(puts)))
+
+        scheduler = SizeAwareScheduler(parallelism, lambda op: op.file_size)
+        results = report_transfers(
+            scheduler.run(lambda op: self.put_file(op.src, op.dst, overwrite), puts),
+            'copy', lambda op: (op.src, op.dst), _already_exists_message)
+        failures, _ = self._record_results(results, journal, lambda op: op.dst.absolute_path)
+        if parallelism > 1:
+            click.echo(str(scheduler.summary))
+        if failures:
+            raise TransferFailedException(failures, len(puts))
+
+    @staticmethod
+    def _walk_local_tree(src, dbfs_path_dst):
+        """
+        Returns the (local, dbfs) pairs of every directory and every file under src.
+        """
+        dirs = [(src, dbfs_path_dst)]
+        files = []
+        for root, dirnames, filenames in os.walk(src, followlinks=True):
+            rel_root = os.path.relpath(root, src)
+            if rel_root == os.curdir:
+                cur_dbfs_root = dbfs_path_dst
             else:
-                try:
-                    self.get_file(cur_dbfs_src, cur_dst, overwrite)
-                    click.echo('{} -> {}'.format(cur_dbfs_src, cur_dst))
-                except LocalFileExistsException:
-                    click.echo(('{} already exists locally as {}. Skip. To overwrite, you' +
-                                'should provide the --overwrite flag.').format(cur_dbfs_src,
-                                                                               cur_dst))
-
-    def cp(self, recursive, overwrite, src, dst):
-        if not DbfsPath.is_valid(src) and DbfsPath.is_valid(dst):
-            if not os.path.exists(src):
-                error_and_quit('The local file {} does not exist.'.format(src))
-            if not recursive:
-                if os.path.isdir(src):
-                    error_and_quit(
-                        ('The local file {} is a directory. You must provide --recursive')
-                        .format(src))
-                self._copy_to_dbfs_non_recursive(src, DbfsPath(dst), overwrite)
+                cur_dbfs_root = dbfs_path_dst.join('/'.join(rel_root.split(os.sep)))
+            for dirname in dirnames:
+                dirs.append((os.path.join(root, dirname), cur_dbfs_root.join(dirname)))
+            for filename in filenames:
+                cur_src = os.path.join(root, filename)
+                if os.path.isfile(cur_src):
+                    files.append((cur_src, cur_dbfs_root.join(filename)))
+        return dirs, files
+
+    def _copy_from_dbfs_recursive(self, dbfs_path_src, dst, overwrite,
+                                  parallelism=DEFAULT_PARALLELISM, resume=False):
+        self.get_dir(dbfs_path_src, dst, overwrite, parallelism, resume=resume)
+
+    def get_dir(self, dbfs_path, dst_path, overwrite, parallelism=DEFAULT_PARALLELISM,
+                max_bytes_in_flight=DEFAULT_MAX_BYTES_IN_FLIGHT, resume=False):
+        """
+        At most max_bytes_in_flight bytes are downloaded at a time. With resume, files recorded in
+        the TransferJournal by an earlier run are skipped.
+        """
+        if os.path.isfile(dst_path):
+            click.echo('{} exists as a file. Skipping this subtree {}'.format(
+                dst_path, repr(dbfs_path)))
+            return
+        elif not os.path.isdir(dst_path):
+            os.makedirs(dst_path)
+        journal = TransferJournal(dbfs_path.absolute_path, os.path.abspath(dst_path), resume)
+        budget = ByteBudget(max_bytes_in_flight)
+        completed = []
+        results = report_transfers(
+            crawl([(dbfs_path, dst_path)], lambda directory: self.list_files(directory[0]),
+                  lambda directory, listing: self._expand_download_dir(
+                      directory[1], listing, journal, completed),
+                  lambda item: self._download_entry(item, overwrite, resume, budget),
+                  parallelism),
+            'copy', lambda item: item[:2], _local_exists_message)
+        failures, num_results = self._record_results(
+            results, journal, lambda item: os.path.abspath(item[1]))
+        if completed:
+            click.echo('Skipped {} files copied by a previous run.'.format(len(completed)))
+        if failures:
+            raise TransferFailedException(failures, num_results)
+
+    @staticmethod
+    def _expand_download_dir(dst, listing, journal, completed):
+        """
+        Returns the directories and files of a get_dir listing to fetch next. Files in the
+        journal are added to completed instead.
+        """
+        dirs = []
+        files = []
+        for file_info in listing:
+            child_dst = os.path.join(dst, file_info.dbfs_path.basename)
+            if not file_info.is_dir:
+                if journal.is_completed(os.path.abspath(child_dst)):
+                    completed.append(child_dst)
+                else:
+                    files.append((file_info.dbfs_path, child_dst, file_info))
+            elif os.path.isfile(child_dst):
+                click.echo('{} exists as a file. Skipping this subtree {}'.format(
+                    child_dst, repr(file_info.dbfs_path)))
+            else:
+                if not os.path.isdir(child_dst):
+                    os.makedirs(child_dst)
+                dirs.append((file_info.dbfs_path, child_dst))
+        return dirs, files
+
+    def _download_entry(self, item, overwrite, resume, budget):
+        cur_dbfs_src, cur_dst, file_info = item
+        acquired = budget.acquire(file_info.file_size)
+        try:
+            self.get_file(cur_dbfs_src, cur_dst, overwrite, resume=resume, file_info=file_info)
+        finally:
+            budget.release(acquired)
+
+    @staticmethod
+    def _record_results(results, journal, journal_key):
+        """
+        Consumes report_transfers results, recording completed items in journal. Returns the
+        failures and the number of results.
+        """
+        failures = []
+        num_results = 0
+        finished = False
+        try:
+            for item, result in results:
+                num_results += 1
+                if not result.ok:
+                    failures.append(result)
+                elif not result.skipped:
+                    journal.record(journal_key(item))
+            finished = True
+        finally:
+            journal.close(succeeded=finished and not failures)
+        return failures, num_results
+
+    def copy_file(self, dbfs_path_src, dbfs_path_dst, overwrite, file_info=None):
+        """
+        Copies a DBFS file to another DBFS path without going through local disk.
+        """
+        if file_info is None:
+            file_info = self.get_status(dbfs_path_src)
+            if file_info.is_dir:
+                error_and_quit(('The dbfs file {} is a directory.').format(repr(dbfs_path_src)))
+        length = file_info.file_size
+        if length <= SMALL_FILE_THRESHOLD_BYTES:
+            contents = read_range(self.client, dbfs_path_src.absolute_path, 0, length)
+            self.client.put(dbfs_path_dst.absolute_path, b64encode(contents).decode(), overwrite)
+            return
+        with DbfsReader(self.client, dbfs_path_src, length, BUFFER_SIZE_BYTES) as reader, \
+                self.open(dbfs_path_dst, 'wb', overwrite) as writer:
+            while True:
+                data = reader.read1()
+                if not data:
+                    break
+                writer.write(data)
+
+    def copy_dir(self, dbfs_path_src, dbfs_path_dst, overwrite,
+                 parallelism=DEFAULT_PARALLELISM):
+        """
+        Copies a DBFS directory tree to another DBFS path without going through local disk.
+        """
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            root_future, pending = self._submit_copy_tree(executor, dbfs_path_src, dbfs_path_dst,
+                                                          overwrite)
+            # An empty tree has nothing waiting on the root, so surface its error here.
+            root_future.result()
+            completed = ((pending[future], None, future.exception())
+                         for future in as_completed(pending))
+            failures = [result for _, result in report_transfers(
+                completed, 'copy', lambda item: (item[0].dbfs_path, item[1]),
+                _already_exists_message) if not result.ok]
+        if failures:
+            raise TransferFailedException(failures, len(pending))
+
+    def _submit_copy_tree(self, executor, dbfs_path_src, dbfs_path_dst, overwrite):
+        """
+        Submits the copy of every entry under dbfs_path_src to executor. Returns the future of
+        the mkdirs of dbfs_path_dst and a dict of the other futures to their
+        ``(FileInfo, destination)``.
+        """
+        # Each directory is created before anything inside it. Directories are submitted
+        # before their children, so an entry only ever waits on a mkdirs that has started.
+        root = dbfs_path_src.absolute_path.rstrip('/')
+        dir_futures = {root: executor.submit(self.mkdirs, dbfs_path_dst)}
+
+        def _copy_entry(file_info, cur_dst, parent):
+            dir_futures[parent].result()
+            if file_info.is_dir:
+                self.mkdirs(cur_dst)
+            else:
+                self.copy_file(file_info.dbfs_path, cur_dst, overwrite, file_info)
+
+        pending = {}
+        for file_info in self.walk(dbfs_path_src):
+            cur_src = file_info.dbfs_path
+            cur_dst = dbfs_path_dst.join(cur_src.relpath(dbfs_path_src))
+            parent = cur_src.absolute_path.rsplit('/', 1)[0]
+            future = executor.submit(_copy_entry, file_info, cur_dst, parent)
+            if file_info.is_dir:
+                dir_futures[cur_src.absolute_path.rstrip('/')] = future
+            pending[future] = (file_info, cur_dst)
+        return dir_futures[root], pending
+
+    def put_artifact(self, src, artifact_root=DbfsPath(DEFAULT_ARTIFACT_ROOT)):
+        """
+        Stores src in the content-addressed artifact store at artifact_root and returns its
+        DbfsPath. Content that is already stored is not uploaded again.
+        """
+        size = os.path.getsize(src)
+        sha256 = hash_file(src)
+        name = os.path.basename(src)
+        dst = artifact_path(artifact_root, sha256, name)
+        try:
+            # A stored artifact with the wrong size is left over from an interrupted upload.
+            if self.get_status(dst).file_size == size:
+                return dst
+        except HTTPError as e:
+            if e.response.json()['error_code'] != DbfsErrorCodes.RESOURCE_DOES_NOT_EXIST:
+                raise e
+        self.put_file(src, dst, overwrite=True)
+        index = self.get_artifact_index(artifact_root)
+        index.record(dst, sha256, size, name)
+        with self.open(artifact_root.join(ARTIFACT_INDEX_FILE_NAME), 'wb',
+                       overwrite=True) as index_file:
+            index_file.write(index.to_json())
+        return dst
+
+    def get_artifact_index(self, artifact_root=DbfsPath(DEFAULT_ARTIFACT_ROOT)):
+        """
+        Returns the ArtifactIndex of the artifact store at artifact_root.
+        """
+        try:
+            with self.open(artifact_root.join(ARTIFACT_INDEX_FILE_NAME)) as index_file:
+                return ArtifactIndex.from_json(index_file.read())
+        except HTTPError as e:
+            if e.response.json()['error_code'] != DbfsErrorCodes.RESOURCE_DOES_NOT_EXIST:
+                raise e
+        return ArtifactIndex()
+
+    def _list_files_recursive(self, dbfs_path):
+        """
+        Returns a dict from the '/' separated path relative to dbfs_path to the FileInfo of every
+        file under it.
+        """
+        prefix = dbfs_path.absolute_path.rstrip('/') + '/'
+        files = {}
+        try:
+            for file_info in self.walk(dbfs_path):
+                if not file_info.is_dir:
+                    files[file_info.dbfs_path.absolute_path[len(prefix):]] = file_info
+        except HTTPError as e:
+            if e.response.json()['error_code'] != DbfsErrorCodes.RESOURCE_DOES_NOT_EXIST:
+                raise e
+        return files
+
+    def sync(self, src, dbfs_path_dst, delete=False, parallelism=DEFAULT_PARALLELISM,
+             manifest_path=None):
+        """
+        Uploads the files of src that changed since the last sync recorded in the manifest. With
+        delete, remote files that no longer exist locally are removed.
+        """
+        if manifest_path is None:
+            manifest_path = SyncManifest.path_for(src, dbfs_path_dst.absolute_path)
+        manifest = SyncManifest.load(manifest_path, dbfs_path_dst.absolute_path)
+        remote_files = self._list_files_recursive(dbfs_path_dst)
+        to_upload, unchanged = self._diff_sync(src, dbfs_path_dst, manifest, remote_files)
+        extras = self._remote_extras(remote_files, to_upload, unchanged) if delete else []
+
+        scheduler = SizeAwareScheduler(parallelism, lambda item: os.path.getsize(item[1]))
+        failures = []
+        try:
+            num_uploaded = self._sync_uploads(scheduler, to_upload, manifest, failures)
+            num_deleted = self._sync_deletes(extras, parallelism, manifest, failures)
+        finally:
+            manifest.save()
+        if parallelism > 1:
+            click.echo(str(scheduler.summary))
+        click.echo('{} uploaded, {} unchanged, {} deleted, {} failed.'.format(
+            num_uploaded, len(unchanged), num_deleted, len(failures)))
+        if failures:
+            raise TransferFailedException(failures, len(to_upload) + len(extras))
+
+    def _diff_sync(self, src, dbfs_path_dst, manifest, remote_files):
+        """
+        Returns ``(to_upload, unchanged)``: the ``(rel_path, src, dbfs_dst, sha256)`` of every
+        local file that differs from the remote one, and the relative paths of the others.
+        """
+        _, local_files = self._walk_local_tree(src, dbfs_path_dst)
+        to_upload = []
+        unchanged = []
+        for cur_src, cur_dbfs_dst in local_files:
+            if os.path.abspath(cur_src) == os.path.abspath(manifest.path):
+                continue
+            rel_path = '/'.join(os.path.relpath(cur_src, src).split(os.sep))
+            sha256 = manifest.current_hash(rel_path, cur_src)
+            remote = remote_files.get(rel_path)
+            if remote is not None and remote.file_size == os.path.getsize(cur_src) and \
+                    manifest.is_unchanged(rel_path, sha256):
+                unchanged.append(rel_path)
+                manifest.record(rel_path, cur_src, sha256)
+            else:
+                to_upload.append((rel_path, cur_src, cur_dbfs_dst, sha256))
+        return to_upload, unchanged
+
+    @staticmethod
+    def _remote_extras(remote_files, to_upload, unchanged):
+        local_rel_paths = set(unchanged).union(item[0] for item in to_upload)
+        return [(rel_path, file_info) for rel_path, file_info in remote_files.items()
+                if rel_path not in local_rel_paths]
+
+    def _sync_uploads(self, scheduler, to_upload, manifest, failures):
+        def _upload(item):
+            _, cur_src, cur_dbfs_dst, _ = item
+            self.put_file(cur_src, cur_dbfs_dst, True)
+
+        num_uploaded = 0
+        for item, result in report_transfers(scheduler.run(_upload, to_upload), 'copy',
+                                             lambda item: (item[1], item[2])):
+            rel_path, cur_src, _, sha256 = item
+            if result.ok:
+                manifest.record(rel_path, cur_src, sha256)
+                num_uploaded += 1
+            else:
+                failures.append(result)
+        return num_uploaded
+
+    def _sync_deletes(self, extras, parallelism, manifest, failures):
+        def _delete(item):
+            self.delete(item[1].dbfs_path, False)
+
+        num_deleted = 0
+        for (rel_path, file_info), _, e in run_in_parallel(_delete, extras, parallelism):
+            if e is None:
+                manifest.forget(rel_path)
+                num_deleted += 1
+                click.echo('Deleted {}'.format(file_info.dbfs_path))
             else:
-                if not os.path.isdir(src):
-                    self._copy_to_dbfs_non_recursive(src, DbfsPath(dst), overwrite)
-                    return
-                self._copy_to_dbfs_recursive(src, DbfsPath(dst), overwrite)
+                click.echo('Failed to delete {}: {}'.format(file_info.dbfs_path, e))
+                failures.append(TransferResult(file_info.dbfs_path, None, error=e))
+        return num_deleted
+
+    def _copy_stdio(self, recursive, overwrite, src, dst):
+        if recursive:
+            error_and_quit('--recursive cannot be used when copying from stdin or to stdout.')
+        if src == STDIO_PATH and DbfsPath.is_valid(dst):
+            # DbfsWriter holds at most a few blocks, so this runs in constant memory however
+            # much is piped in.
+            stdin = click.get_binary_stream('stdin')
+            with self.open(DbfsPath(dst), 'wb', overwrite) as dbfs_file:
+                while True:
+                    data = stdin.read(BUFFER_SIZE_BYTES)
+                    if not data:
+                        break
+                    dbfs_file.write(data)
+        elif DbfsPath.is_valid(src) and dst == STDIO_PATH:
+            stdout = click.get_binary_stream('stdout')
+            self.cat(DbfsPath(src), stdout)
+            stdout.flush()
+        else:
+            error_and_quit('{} can only be copied to or from a DBFS path.'.format(STDIO_PATH))
+
+    def cp(self, recursive, overwrite, src, dst, parallelism=DEFAULT_PARALLELISM, resume=False,
+           dry_run=False):
+        """
+        Copies src to dst, where one of them is a DBFS path. The other may be a local path, or
+        ``-`` to upload from stdin or print to stdout.
+        """
+        if STDIO_PATH in (src, dst):
+            self._copy_stdio(recursive, overwrite, src, dst)
+            return
+        if dry_run and not (recursive and not DbfsPath.is_valid(src) and DbfsPath.is_valid(dst)
+                            and os.path.isdir(src)):
+            error_and_quit('--dry-run is only supported when recursively copying a local '
+                           'directory to DBFS.')
+        if not DbfsPath.is_valid(src) and DbfsPath.is_valid(dst):
+            self._cp_to_dbfs(recursive, overwrite, src, DbfsPath(dst), parallelism, resume,
+                             dry_run)
         # Copy from DBFS in this case
         elif DbfsPath.is_valid(src) and not DbfsPath.is_valid(dst):
-            if not recursive:
-                self._copy_from_dbfs_non_recursive(DbfsPath(src), dst, overwrite)
-            else:
-                dbfs_path_src = DbfsPath(src)
-                if not self.get_status(dbfs_path_src).is_dir:
-                    self._copy_from_dbfs_non_recursive(dbfs_path_src, dst, overwrite)
-                self._copy_from_dbfs_recursive(dbfs_path_src, dst, overwrite)
+            self._cp_from_dbfs(recursive, overwrite, DbfsPath(src), dst, parallelism, resume)
         elif not DbfsPath.is_valid(src) and not DbfsPath.is_valid(dst):
             error_and_quit('Both paths provided are from your local filesystem. '
                            'To use this utility, one of the src or dst must be prefixed '
                            'with dbfs:/')
         elif DbfsPath.is_valid(src) and DbfsPath.is_valid(dst):
-            error_and_quit('Both paths provided are from the DBFS filesystem. '
-                           'To copy between the DBFS filesystem, you currently must copy the '
-                           'file from DBFS to your local filesystem and then back.')
+            self._cp_within_dbfs(recursive, overwrite, DbfsPath(src), DbfsPath(dst), parallelism)
         else:
             assert False, 'not reached'
+
+    def _cp_to_dbfs(self, recursive, overwrite, src, dbfs_path_dst, parallelism, resume,
+                    dry_run):
+        if not os.path.exists(src):
+            error_and_quit('The local file {} does not exist.'.format(src))
+        if not os.path.isdir(src):
+            self._copy_to_dbfs_non_recursive(src, dbfs_path_dst, overwrite)
+        elif not recursive:
+            error_and_quit(
+                ('The local file {} is a directory. You must provide --recursive').format(src))
+        else:
+            self._copy_to_dbfs_recursive(src, dbfs_path_dst, overwrite, parallelism, resume,
+                                         dry_run)
+
+    def _cp_from_dbfs(self, recursive, overwrite, dbfs_path_src, dst, parallelism, resume):
+        if recursive and self.get_status(dbfs_path_src).is_dir:
+            self._copy_from_dbfs_recursive(dbfs_path_src, dst, overwrite, parallelism, resume)
+        else:
+            self._copy_from_dbfs_non_recursive(dbfs_path_src, dst, overwrite, parallelism,
+                                               resume)
+
+    def _cp_within_dbfs(self, recursive, overwrite, dbfs_path_src, dbfs_path_dst, parallelism):
+        file_info = self.get_status(dbfs_path_src)
+        if not file_info.is_dir:
+            self._copy_within_dbfs_non_recursive(dbfs_path_src, dbfs_path_dst, overwrite,
+                                                 file_info)
+        elif not recursive:
+            error_and_quit(('The dbfs file {} is a directory. You must provide '
+                            '--recursive').format(dbfs_path_src.absolute_path))
+        else:
+            self.copy_dir(dbfs_path_src, dbfs_path_dst, overwrite, parallelism)
@@ -0,0 +1,79 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from databricks_cli.dbfs.sync import SHA256, SIZE
+
+DEFAULT_ARTIFACT_ROOT = 'dbfs:/artifacts'
+ARTIFACT_INDEX_FILE_NAME = 'index.json'
+ARTIFACT_INDEX_VERSION = 1
+
+NAME = 'name'
+
+
+def artifact_path(root, sha256, name):
+    """
+    Returns the canonical DBFS path of the artifact with content hash sha256 and file name
+    name under root. The file name is kept so that wheels and jars stay installable.
+    """
+    return root.join(SHA256).join(sha256).join(name)
+
+
+class ArtifactIndex(object):
+    """
+    The index file at the root of an artifact store. It maps the canonical path of every stored
+    artifact to its content hash, size and file name.
+
+    The index is a catalogue of the store rather than its source of truth: whether an artifact
+    is stored is decided by the existence of its canonical path, so an entry lost to two
+    concurrent uploads only leaves the artifact out of listings.
+    """
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def from_json(cls, contents):
+        """
+        Parses an index file. An unreadable index, or one of another version, yields an empty
+        index.
+        """
+        try:
+            index = json.loads(contents.decode('utf-8'))
+        except ValueError:
+            return cls()
+        if not isinstance(index, dict) or index.get('version') != ARTIFACT_INDEX_VERSION:
+            return cls()
+        return cls(index.get('artifacts', {}))
+
+    def to_json(self):
+        return json.dumps({
+            'version': ARTIFACT_INDEX_VERSION,
+            'artifacts': self.entries
+        }, indent=2, sort_keys=True).encode('utf-8')
+
+    def record(self, dbfs_path, sha256, size, name):
+        self.entries[dbfs_path.absolute_path] = {SHA256: sha256, SIZE: size, NAME: name}
+
+    def paths_for(self, sha256):
+        return sorted(path for path, entry in self.entries.items() if entry[SHA256] == sha256)
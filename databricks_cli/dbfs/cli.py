@@ -28,8 +28,12 @@ from databricks_cli.utils import eat_exceptions, error_and_quit, CONTEXT_SETTING
 from databricks_cli.version import print_version_callback, version
 from databricks_cli.configure.cli import configure_cli
 from databricks_cli.configure.config import provide_api_client, profile_option, debug_option
-from databricks_cli.dbfs.api import DbfsApi
+from databricks_cli.dbfs.api import DbfsApi, TAIL_POLL_INTERVAL_SECONDS
+from databricks_cli.dbfs.artifacts import DEFAULT_ARTIFACT_ROOT
 from databricks_cli.dbfs.dbfs_path import DbfsPath, DbfsPathClickType
+from databricks_cli.dbfs.transfer import DEFAULT_PARALLELISM
+
+DEFAULT_PEEK_BYTES = 2**16
 
 
 @click.command(context_settings=CONTEXT_SETTINGS)
@@ -37,14 +41,19 @@ from databricks_cli.dbfs.dbfs_path import DbfsPath, DbfsPathClickType
               help='Displays absolute paths.')
 @click.option('-l', is_flag=True, default=False,
               help='Displays full information including size and file type.')
+@click.option('--recursive', '-R', is_flag=True, default=False,
+              help='Lists all files and directories under the path.')
 @click.argument('dbfs_path', nargs=-1, type=DbfsPathClickType())
 @debug_option
 @profile_option
 @eat_exceptions
 @provide_api_client
-def ls_cli(api_client, l, absolute, dbfs_path): #  NOQA
+def ls_cli(api_client, l, absolute, recursive, dbfs_path): #  NOQA
     """
     List files in DBFS.
+
+    With --recursive, entries are printed as soon as their directory has been listed, with
+    paths relative to the listed path. They are not sorted.
     """
     if len(dbfs_path) == 0:
         dbfs_path = DbfsPath('dbfs:/')
@@ -52,12 +61,108 @@ def ls_cli(api_client, l, absolute, dbfs_path): #  NOQA
         dbfs_path = dbfs_path[0]
     else:
         error_and_quit('ls can take a maximum of one path.')
+    if recursive:
+        for f in DbfsApi(api_client).walk(dbfs_path):
+            row = f.to_row(is_long_form=l, is_absolute=absolute, relative_to=dbfs_path)
+            click.echo(_format_streamed_row(row))
+        return
     files = DbfsApi(api_client).list_files(dbfs_path)
     table = tabulate([f.to_row(is_long_form=l, is_absolute=absolute) for f in files],
                      tablefmt='plain')
     click.echo(table)
 
 
+def _format_streamed_row(row):
+    # Rows are printed one at a time, so columns get a fixed width instead of being aligned by
+    # tabulate.
+    if len(row) == 1:
+        return row[0]
+    filetype, file_size, path = row
+    return '{:<4}  {:>12}  {}'.format(filetype, file_size, path)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option('--max-depth', '-d', type=click.IntRange(min=0), default=None,
+              help='Only print totals for directories at most this many levels below the path.')
+@click.option('--sort', is_flag=True, default=False,
+              help='Print the totals sorted by size once the crawl completes.')
+@click.argument('dbfs_path', type=DbfsPathClickType())
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+def du_cli(api_client, max_depth, sort, dbfs_path):
+    """
+    Summarize disk usage of a DBFS directory.
+
+    Prints the total size in bytes of the path and of each directory under it. Totals are
+    printed as soon as a directory's subtree has been listed, deepest first. With --sort, they
+    are printed largest first after the whole tree has been listed.
+    """
+    usages = DbfsApi(api_client).disk_usage(dbfs_path, max_depth)
+    if sort:
+        usages = sorted(usages, key=lambda usage: usage[1], reverse=True)
+    for path, total_bytes in usages:
+        click.echo('{}\t{}'.format(total_bytes, path.absolute_path))
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.argument('dbfs_path', type=DbfsPathClickType())
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+def cat_cli(api_client, dbfs_path):
+    """
+    Print the contents of a DBFS file.
+
+    The file is streamed to stdout as it is read, without being copied to local disk first.
+    """
+    DbfsApi(api_client).cat(dbfs_path, click.get_binary_stream('stdout'))
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option('--bytes', '-c', 'num_bytes', type=click.IntRange(min=0),
+              default=DEFAULT_PEEK_BYTES, show_default=True,
+              help='Number of bytes to print.')
+@click.argument('dbfs_path', type=DbfsPathClickType())
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+def head_cli(api_client, num_bytes, dbfs_path):
+    """
+    Print the first bytes of a DBFS file.
+
+    Only the requested bytes are read from DBFS.
+    """
+    DbfsApi(api_client).head(dbfs_path, click.get_binary_stream('stdout'), num_bytes)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option('--bytes', '-c', 'num_bytes', type=click.IntRange(min=0),
+              default=DEFAULT_PEEK_BYTES, show_default=True,
+              help='Number of bytes to print.')
+@click.option('--follow', '-f', is_flag=True, default=False,
+              help='Keep printing bytes as they are appended to the file.')
+@click.option('--interval', type=float, default=TAIL_POLL_INTERVAL_SECONDS,
+              show_default=True, help='Seconds between checks for new bytes with --follow.')
+@click.argument('dbfs_path', type=DbfsPathClickType())
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+def tail_cli(api_client, num_bytes, follow, interval, dbfs_path):
+    """
+    Print the last bytes of a DBFS file.
+
+    Only the requested bytes are read from DBFS. With --follow, the file size is polled and
+    appended bytes are printed until interrupted.
+    """
+    DbfsApi(api_client).tail(dbfs_path, click.get_binary_stream('stdout'), num_bytes, follow,
+                             interval)
+
+
 @click.command(context_settings=CONTEXT_SETTINGS)
 @click.argument('dbfs_path', type=DbfsPathClickType())
 @debug_option
@@ -92,18 +197,25 @@ def rm_cli(api_client, recursive, dbfs_path):
 @click.command(context_settings=CONTEXT_SETTINGS)
 @click.option('--recursive', '-r', is_flag=True, default=False)
 @click.option('--overwrite', is_flag=True, default=False)
+@click.option('--parallelism', '-p', type=click.IntRange(min=1), default=DEFAULT_PARALLELISM,
+              help='Number of concurrent requests used to copy files.')
+@click.option('--resume', is_flag=True, default=False,
+              help='Continue a copy that was interrupted instead of starting over.')
+@click.option('--dry-run', is_flag=True, default=False,
+              help='Print the operations of a recursive upload without performing them.')
 @click.argument('src')
 @click.argument('dst')
 @debug_option
 @profile_option
 @eat_exceptions
 @provide_api_client
-def cp_cli(api_client, recursive, overwrite, src, dst):
+def cp_cli(api_client, recursive, overwrite, parallelism, resume, dry_run, src, dst):
     """
     Copy files to and from DBFS.
 
-    Note that this function will fail if the src and dst are both on the local filesystem
-    or if they are both DBFS paths.
+    Note that this function will fail if the src and dst are both on the local filesystem.
+    When both are DBFS paths, files are streamed from one to the other without going through
+    local disk, and recursive copies transfer up to --parallelism files at the same time.
 
     For non-recursive copies, if the dst is a directory, the file will be placed inside the
     directory. For example ``dbfs cp dbfs:/apple.txt .`` will create a file at `./apple.txt`.
@@ -113,9 +225,69 @@ def cp_cli(api_client, recursive, overwrite, src, dst):
     ``dbfs cp -r dbfs:/foo foo`` will create a directory foo and place the files ``dbfs:/foo/a`` at
     ``foo/a``. If ``foo/a`` already exists, the file will not be overriden unless the --overwrite
     flag is provided -- however, dbfs cp --recursive will continue to try and copy other files.
+
+    Recursive copies transfer up to --parallelism files at the same time. Files that fail to
+    copy are reported once the rest of the tree has been copied. A single file copied from DBFS
+    is downloaded as --parallelism concurrent ranged reads.
+
+    Downloads of large files keep their progress in a ``.partial`` file next to the target, and
+    recursive copies record completed files in a journal under ~/.databricks-cli. With --resume,
+    an interrupted copy continues from where it stopped.
+
+    Recursive uploads list the DBFS target once and plan the minimal set of requests before
+    transferring anything. --dry-run prints that plan and stops.
+
+    Use - as the src to upload stdin to a DBFS file, or as the dst to print a DBFS file to stdout.
+    For example ``pg_dump db | dbfs cp - dbfs:/dumps/db.sql``. Both stream in constant memory.
     """
     # Copy to DBFS in this case
-    DbfsApi(api_client).cp(recursive, overwrite, src, dst)
+    DbfsApi(api_client).cp(recursive, overwrite, src, dst, parallelism, resume, dry_run)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option('--delete', is_flag=True, default=False,
+              help='Delete remote files that do not exist locally.')
+@click.option('--parallelism', '-p', type=click.IntRange(min=1), default=DEFAULT_PARALLELISM,
+              help='Number of files to upload concurrently.')
+@click.option('--manifest', default=None, type=click.Path(dir_okay=False),
+              help='Path of the sync manifest. Defaults to one kept in ~/.databricks-cli for '
+                   'this src and dst.')
+@click.argument('src', type=click.Path(exists=True, file_okay=False))
+@click.argument('dst', type=DbfsPathClickType())
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+def sync_cli(api_client, delete, parallelism, manifest, src, dst):
+    """
+    Incrementally uploads a local directory to DBFS.
+
+    Only files that are new or have changed since the last sync are uploaded. Changes are
+    detected by comparing the remote file sizes and the content hashes recorded in a manifest
+    kept for each src and dst pair. With --delete, files under dst that no longer exist in src
+    are removed.
+    """
+    DbfsApi(api_client).sync(src, dst, delete, parallelism, manifest)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option('--root', type=DbfsPathClickType(), default=DEFAULT_ARTIFACT_ROOT,
+              show_default=True, help='Root of the artifact store.')
+@click.argument('src', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+def put_artifact_cli(api_client, root, src):
+    """
+    Store files in a content-addressed artifact store.
+
+    Each file is stored under a path derived from its sha256 and file name, and that canonical
+    path is printed. A file whose content is already stored is not uploaded again.
+    """
+    dbfs_api = DbfsApi(api_client)
+    for path in src:
+        click.echo(dbfs_api.put_artifact(path, root).absolute_path)
 
 
 @click.command(context_settings=CONTEXT_SETTINGS)
@@ -148,7 +320,13 @@ def dbfs_group():
 
 dbfs_group.add_command(configure_cli, name='configure')
 dbfs_group.add_command(ls_cli, name='ls')
+dbfs_group.add_command(du_cli, name='du')
+dbfs_group.add_command(cat_cli, name='cat')
+dbfs_group.add_command(head_cli, name='head')
+dbfs_group.add_command(tail_cli, name='tail')
 dbfs_group.add_command(mkdirs_cli, name='mkdirs')
 dbfs_group.add_command(rm_cli, name='rm')
 dbfs_group.add_command(cp_cli, name='cp')
 dbfs_group.add_command(mv_cli, name='mv')
+dbfs_group.add_command(sync_cli, name='sync')
+dbfs_group.add_command(put_artifact_cli, name='put-artifact')
@@ -24,3 +24,11 @@
 
 class LocalFileExistsException(Exception):
     pass
+
+
+class TransferFailedException(Exception):
+    def __init__(self, failures, total):
+        self.failures = failures
+        self.total = total
+        super(TransferFailedException, self).__init__(
+            '{} of {} files failed to transfer.'.format(len(failures), total))
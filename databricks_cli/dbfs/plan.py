@@ -0,0 +1,125 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+
+class TransferOperation(object):
+    MKDIRS = 'mkdirs'
+    PUT = 'put'
+    SKIP = 'skip'
+
+    def __init__(self, kind, dst, src=None, file_size=0, reason=None):
+        self.kind = kind
+        self.dst = dst
+        self.src = src
+        self.file_size = file_size
+        self.reason = reason
+
+    def to_line(self):
+        if self.kind == self.MKDIRS:
+            return 'mkdirs {}'.format(self.dst.absolute_path)
+        elif self.kind == self.PUT:
+            return 'put    {} -> {}'.format(self.src, self.dst.absolute_path)
+        return 'skip   {} -> {} ({})'.format(self.src, self.dst.absolute_path, self.reason)
+
+
+class UploadPlan(object):
+    """
+    The operations needed to upload a local tree, computed from a single listing of the remote
+    target before any transfer starts. Only the deepest missing directories are created since
+    mkdirs also creates every parent, and files that would conflict with existing remote
+    entries are resolved to skips up front instead of failing remotely.
+    """
+    def __init__(self, operations):
+        self.operations = operations
+
+    @property
+    def mkdirs(self):
+        return [op for op in self.operations if op.kind == TransferOperation.MKDIRS]
+
+    @property
+    def puts(self):
+        return [op for op in self.operations if op.kind == TransferOperation.PUT]
+
+    @property
+    def skips(self):
+        return [op for op in self.operations if op.kind == TransferOperation.SKIP]
+
+    @classmethod
+    def build(cls, dirs, files, remote, overwrite):
+        """
+        :param dirs: (local, DbfsPath) pairs of every local directory, parents first.
+        :param files: (local, DbfsPath) pairs of every local file.
+        :param remote: dict from absolute DBFS path to the FileInfo of every existing entry
+                       under the destination, the destination itself included.
+        """
+        operations = []
+        # Remote files standing where the local tree has a directory. Nothing under them can
+        # be uploaded.
+        blocked = []
+        missing = []
+        for cur_src, cur_dbfs_dst in dirs:
+            path = cur_dbfs_dst.absolute_path
+            if _is_under_any(path, blocked):
+                continue
+            existing = remote.get(path)
+            if existing is None:
+                missing.append(cur_dbfs_dst)
+            elif not existing.is_dir:
+                blocked.append(path)
+                operations.append(TransferOperation(
+                    TransferOperation.SKIP, cur_dbfs_dst, cur_src,
+                    reason='exists as a file, skipping this subtree'))
+        # mkdirs creates every parent, so only the deepest missing directories are needed.
+        parents = set(_parent(d.absolute_path) for d in missing)
+        for d in missing:
+            if d.absolute_path not in parents:
+                operations.append(TransferOperation(TransferOperation.MKDIRS, d))
+
+        for cur_src, cur_dbfs_dst in files:
+            path = cur_dbfs_dst.absolute_path
+            if _is_under_any(path, blocked):
+                continue
+            existing = remote.get(path)
+            if existing is not None and existing.is_dir:
+                operations.append(TransferOperation(
+                    TransferOperation.SKIP, cur_dbfs_dst, cur_src, reason='exists as a directory'))
+            elif existing is not None and not overwrite:
+                operations.append(TransferOperation(
+                    TransferOperation.SKIP, cur_dbfs_dst, cur_src, reason='already exists'))
+            else:
+                operations.append(TransferOperation(
+                    TransferOperation.PUT, cur_dbfs_dst, cur_src, os.path.getsize(cur_src)))
+        return cls(operations)
+
+
+def _parent(absolute_path):
+    return absolute_path.rstrip('/').rsplit('/', 1)[0]
+
+
+def _is_under_any(absolute_path, parents):
+    for parent in parents:
+        if absolute_path.startswith(parent.rstrip('/') + '/'):
+            return True
+    return False
@@ -0,0 +1,246 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+from base64 import b64decode
+from threading import Thread
+
+from concurrent.futures import ThreadPoolExecutor
+from six.moves.queue import Queue
+
+from databricks_cli.dbfs.transfer import add_block_body
+
+STREAM_BLOCK_SIZE_BYTES = 2**20
+# Number of blocks a DbfsReader fetches ahead of the read position, and number of full blocks a
+# DbfsWriter may have waiting for its upload thread.
+READAHEAD_BLOCKS = 4
+WRITE_BEHIND_BLOCKS = 4
+
+_CLOSE = object()
+
+
+def read_range(client, path, start, end):
+    """
+    Reads bytes ``[start, end)`` of the DBFS file at ``path`` with as many ranged ``read``
+    requests as needed.
+    """
+    parts = []
+    offset = start
+    while offset < end:
+        response = client.read(path, offset, end - offset)
+        if response['bytes_read'] == 0:
+            raise IOError('Unexpected end of file {} at offset {}'.format(path, offset))
+        parts.append(b64decode(response['data']))
+        offset += response['bytes_read']
+    return b''.join(parts)
+
+
+class DbfsReader(io.BufferedIOBase):
+    """
+    A read-only, seekable file object over a DBFS file. The file is fetched in blocks with
+    ranged ``read`` requests, and the blocks following the read position are fetched ahead on
+    background threads, so sequential reads rarely wait on the network.
+    """
+    def __init__(self, client, dbfs_path, file_size, block_size=STREAM_BLOCK_SIZE_BYTES,
+                 readahead=READAHEAD_BLOCKS):
+        super(DbfsReader, self).__init__()
+        self.name = dbfs_path.absolute_path
+        self.size = file_size
+        self._client = client
+        self._block_size = block_size
+        self._readahead = readahead
+        self._position = 0
+        self._blocks = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, readahead))
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._check_not_closed()
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._check_not_closed()
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('Invalid whence {}'.format(whence))
+        if position < 0:
+            raise ValueError('Negative seek position {}'.format(position))
+        self._position = position
+        return position
+
+    def _block(self, index):
+        """
+        Returns the contents of block ``index`` and makes sure the blocks after it are being
+        fetched. Blocks outside the readahead window are dropped.
+        """
+        last = min(index + self._readahead, (self.size - 1) // self._block_size)
+        for stale in [i for i in self._blocks if i < index or i > last]:
+            self._blocks.pop(stale).cancel()
+        for i in range(index, last + 1):
+            if i not in self._blocks:
+                start = i * self._block_size
+                end = min(start + self._block_size, self.size)
+                self._blocks[i] = self._executor.submit(
+                    read_range, self._client, self.name, start, end)
+        return self._blocks[index].result()
+
+    def peek(self, size=0):
+        self._check_not_closed()
+        if self._position >= self.size:
+            return b''
+        index, within = divmod(self._position, self._block_size)
+        return self._block(index)[within:]
+
+    def read1(self, size=-1):
+        data = self.peek()
+        if size is not None and size >= 0:
+            data = data[:size]
+        self._position += len(data)
+        return data
+
+    def read(self, size=-1):
+        self._check_not_closed()
+        if size is None or size < 0:
+            size = max(0, self.size - self._position)
+        parts = []
+        while size > 0:
+            data = self.read1(size)
+            if not data:
+                break
+            parts.append(data)
+            size -= len(data)
+        return b''.join(parts)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            for future in self._blocks.values():
+                future.cancel()
+            self._blocks = {}
+            self._executor.shutdown(wait=True)
+        super(DbfsReader, self).close()
+
+    def _check_not_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+
+
+class DbfsWriter(io.BufferedIOBase):
+    """
+    A write-only file object that creates a DBFS file. Writes are collected into blocks, and
+    full blocks are appended with ``add_block`` by a background thread while the caller keeps
+    writing. The file is closed on DBFS when the writer is closed. Leaving a ``with`` block
+    through an exception abandons the upload instead of committing a partial file.
+    """
+    def __init__(self, client, dbfs_path, overwrite=False, block_size=STREAM_BLOCK_SIZE_BYTES,
+                 write_behind=WRITE_BEHIND_BLOCKS):
+        super(DbfsWriter, self).__init__()
+        self.name = dbfs_path.absolute_path
+        self._client = client
+        self._block_size = block_size
+        self._buffer = bytearray()
+        self._error = None
+        self._handle = client.create(self.name, overwrite)['handle']
+        self._blocks = Queue(maxsize=max(1, write_behind))
+        self._uploader = Thread(target=self._upload)
+        self._uploader.daemon = True
+        self._uploader.start()
+
+    def writable(self):
+        return True
+
+    def _upload(self):
+        while True:
+            block = self._blocks.get()
+            if block is _CLOSE:
+                return
+            if self._error is not None:
+                # Keep draining so the writer never blocks on a full queue.
+                continue
+            try:
+                self._client.add_block_raw(add_block_body(self._handle, block))
+            except Exception as e: # noqa
+                self._error = e
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+        self._raise_if_failed()
+        self._buffer += b
+        while len(self._buffer) >= self._block_size:
+            self._blocks.put(bytes(self._buffer[:self._block_size]))
+            del self._buffer[:self._block_size]
+        return len(b)
+
+    def _stop_uploader(self):
+        self._blocks.put(_CLOSE)
+        self._uploader.join()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._blocks.put(bytes(self._buffer))
+                self._buffer = bytearray()
+            self._stop_uploader()
+            self._raise_if_failed()
+            self._client.close(self._handle)
+        finally:
+            super(DbfsWriter, self).close()
+
+    def abort(self):
+        """
+        Stops uploading without closing the file on DBFS. Blocks that were already appended stay
+        behind on the unclosed handle.
+        """
+        if self.closed:
+            return
+        self._error = self._error or IOError('Upload of {} aborted.'.format(self.name))
+        self._stop_uploader()
+        super(DbfsWriter, self).close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
@@ -0,0 +1,124 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+
+from databricks_cli.configure.provider import get_state_dir
+
+MANIFEST_VERSION = 1
+HASH_BUFFER_SIZE_BYTES = 2**20
+
+SIZE = 'size'
+MTIME = 'mtime'
+SHA256 = 'sha256'
+
+
+def hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            contents = f.read(HASH_BUFFER_SIZE_BYTES)
+            if len(contents) == 0:
+                break
+            sha.update(contents)
+    return sha.hexdigest()
+
+
+class SyncManifest(object):
+    """
+    Records the size, mtime and content hash of every local file last pushed to a destination.
+    A file whose size and mtime are unchanged is not hashed again. Manifests are kept in the CLI
+    state directory, keyed by source and destination, so syncing one source to several
+    destinations keeps a manifest for each and the source tree is left untouched.
+    """
+    DIR_NAME = 'sync-manifests'
+
+    def __init__(self, path, destination, entries=None):
+        self.path = path
+        self.destination = destination
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, path, destination):
+        """
+        Loads the manifest at path. A missing or unreadable manifest, or one written for
+        another destination, yields an empty manifest so that every file is compared afresh.
+        """
+        if not os.path.isfile(path):
+            return cls(path, destination)
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+        except ValueError:
+            return cls(path, destination)
+        if manifest.get('version') != MANIFEST_VERSION or \
+                manifest.get('destination') != destination:
+            return cls(path, destination)
+        return cls(path, destination, manifest.get('files', {}))
+
+    @classmethod
+    def path_for(cls, src, destination):
+        key = hashlib.sha1(u'{}\n{}'.format(os.path.abspath(src), destination)
+                           .encode('utf-8')).hexdigest()
+        return os.path.join(get_state_dir(), cls.DIR_NAME, key)
+
+    def save(self):
+        if not os.path.isdir(os.path.dirname(os.path.abspath(self.path))):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)))
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'destination': self.destination,
+                'files': self.entries
+            }, f, indent=2, sort_keys=True)
+        if hasattr(os, 'replace'):
+            os.replace(tmp_path, self.path)
+        else:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(tmp_path, self.path)
+
+    def current_hash(self, rel_path, local_path):
+        """
+        Returns the content hash of local_path, reusing the recorded one if the size and mtime
+        have not changed since it was recorded.
+        """
+        stat = os.stat(local_path)
+        entry = self.entries.get(rel_path)
+        if entry is not None and entry[SIZE] == stat.st_size and entry[MTIME] == stat.st_mtime:
+            return entry[SHA256]
+        return hash_file(local_path)
+
+    def is_unchanged(self, rel_path, sha256):
+        entry = self.entries.get(rel_path)
+        return entry is not None and entry[SHA256] == sha256
+
+    def record(self, rel_path, local_path, sha256):
+        stat = os.stat(local_path)
+        self.entries[rel_path] = {SIZE: stat.st_size, MTIME: stat.st_mtime, SHA256: sha256}
+
+    def forget(self, rel_path):
+        self.entries.pop(rel_path, None)
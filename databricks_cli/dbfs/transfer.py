@@ -0,0 +1,626 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import mmap
+import os
+import time
+from base64 import b64encode
+from collections import deque
+from functools import partial
+from itertools import islice
+from threading import Condition, Event, Lock, Thread
+
+import click
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import six
+from six.moves.queue import Queue, Full
+
+from databricks_cli.configure.provider import get_state_dir
+
+# Local I/O backends for DbfsApi. Buffered I/O reads and writes the local file with read and
+# write calls. Mapped I/O works on an mmap of it.
+BUFFERED_IO = 'buffered'
+MMAP_IO = 'mmap'
+IO_BACKENDS = (BUFFERED_IO, MMAP_IO)
+
+DEFAULT_PARALLELISM = 1
+DEFAULT_MAX_BYTES_IN_FLIGHT = 2**30
+DEFAULT_LIST_PARALLELISM = 8
+# Items up to this size are latency bound, so the scheduler hands them out in batches.
+SMALL_ITEM_BYTES = 2**20
+SMALL_BATCH_ITEMS = 16
+# A worker whose throughput falls below this fraction of the fastest worker's is not given any
+# more large items while small ones remain.
+SLOW_WORKER_RATIO = 0.5
+
+_END_OF_STREAM = object()
+
+
+class TransferResult(object):
+    """
+    The outcome of transferring a single file or directory between DBFS and the local
+    filesystem. Either ``skipped`` is set or ``error`` holds the exception that failed it.
+    """
+    def __init__(self, src, dst, error=None, skipped=False):
+        self.src = src
+        self.dst = dst
+        self.error = error
+        self.skipped = skipped
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return 'TransferResult({}, {}, error={}, skipped={})'.format(
+            self.src, self.dst, repr(self.error), self.skipped)
+
+
+def add_block_body(handle, block):
+    """
+    Returns the serialized JSON body of an ``add_block`` request for ``block``, which may be any
+    bytes-like object. The block is base64 encoded straight from it and the body is joined
+    around the encoded bytes rather than built as a dict and passed through json.dumps.
+    """
+    return b''.join((('{"handle": %s, "data": "' % json.dumps(handle)).encode('ascii'),
+                     b64encode(block), b'"}'))
+
+
+def run_in_parallel(fn, items, parallelism):
+    """
+    Calls ``fn`` on each item using a pool of ``parallelism`` threads and yields
+    ``(item, return_value, exception)`` tuples in the order the calls complete. An exception
+    raised by one call never aborts the others.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+        futures = {executor.submit(fn, item): item for item in items}
+        for future in as_completed(futures):
+            exception = future.exception()
+            if exception is not None:
+                yield futures[future], None, exception
+            else:
+                yield futures[future], future.result(), None
+
+
+def run_windowed(fn, items, parallelism, window):
+    """
+    Calls ``fn`` on each item using a pool of ``parallelism`` threads, with at most ``window``
+    calls queued or in flight, and yields the items in the order their calls complete. The
+    first exception raised by a call stops scheduling and is re-raised.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+        pending = {executor.submit(fn, item): item for item in islice(items, window)}
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                future.result()
+                for next_item in islice(items, 1):
+                    pending[executor.submit(fn, next_item)] = next_item
+                yield item
+
+
+def crawl(roots, list_dir, expand, transfer, parallelism):
+    """
+    Transfers the files of a tree while the tree is still being listed. Directories are listed
+    with ``list_dir`` on one pool of ``parallelism`` threads while files are transferred with
+    ``transfer`` on another, so listing runs ahead of the transfers. At most
+    ``2 * parallelism`` transfers are submitted at a time and the other files wait in line, so
+    a tree of any size costs the same per file.
+
+    ``expand(directory, listing)`` is called on the calling thread for every listed directory
+    and returns the ``(directories, files)`` to list and to transfer next. Yields
+    ``(item, return_value, exception)`` tuples for every transferred file and every directory
+    that failed to be listed, in the order they complete.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as lister, \
+            ThreadPoolExecutor(max_workers=max(1, parallelism)) as transferrer:
+        crawler = _Crawler(partial(lister.submit, list_dir),
+                           partial(transferrer.submit, transfer))
+        for root in roots:
+            crawler.submit(root, True)
+        try:
+            for result in crawler.results(expand, 2 * max(1, parallelism)):
+                yield result
+        finally:
+            crawler.cancel()
+
+
+class _Crawler(object):
+    """
+    State of a single crawl. Completed futures are handed over through a queue filled by their
+    done callbacks, so each completion costs the same however many futures are pending.
+    """
+    def __init__(self, submit_listing, submit_transfer):
+        self.submit_listing = submit_listing
+        self.submit_transfer = submit_transfer
+        self.completed = Queue()
+        self.listings = set()
+        self.transfers = set()
+        self.waiting = deque()
+
+    def submit(self, item, is_listing):
+        if is_listing:
+            future = self.submit_listing(item)
+            self.listings.add(future)
+        else:
+            future = self.submit_transfer(item)
+            self.transfers.add(future)
+        future.add_done_callback(lambda f: self.completed.put((f, item, is_listing)))
+
+    def results(self, expand, window):
+        while self.listings or self.transfers or self.waiting:
+            while self.waiting and len(self.transfers) < window:
+                self.submit(self.waiting.popleft(), False)
+            future, item, is_listing = self.completed.get()
+            (self.listings if is_listing else self.transfers).discard(future)
+            e = future.exception()
+            if e is not None:
+                yield item, None, e
+            elif is_listing:
+                directories, files = expand(item, future.result())
+                for directory in directories:
+                    self.submit(directory, True)
+                self.waiting.extend(files)
+            else:
+                yield item, future.result(), None
+
+    def cancel(self):
+        for future in self.listings | self.transfers:
+            future.cancel()
+
+
+def report_transfers(results, verb, endpoints, skip_message=None):
+    """
+    Echoes the outcome of every ``(item, return_value, exception)`` in ``results`` and yields
+    it as ``(item, TransferResult)``. ``endpoints(item)`` returns the source and destination
+    of an item. An exception for which ``skip_message(src, dst, exception)`` returns a message
+    is reported as a skip rather than as a failure.
+    """
+    for item, _, e in results:
+        src, dst = endpoints(item)
+        message = skip_message(src, dst, e) if e is not None and skip_message else None
+        if e is None:
+            click.echo('{} -> {}'.format(src, dst))
+            yield item, TransferResult(src, dst)
+        elif message is not None:
+            click.echo(message)
+            yield item, TransferResult(src, dst, skipped=True)
+        else:
+            click.echo('Failed to {} {} -> {}: {}'.format(verb, src, dst, e))
+            yield item, TransferResult(src, dst, error=e)
+
+
+class ByteBudget(object):
+    """
+    A counting semaphore measured in bytes. It bounds how many bytes concurrent transfers may
+    have in flight at once. A single request larger than the whole budget is admitted alone
+    rather than blocking forever.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.in_flight = 0
+        self._condition = Condition()
+
+    def acquire(self, num_bytes):
+        num_bytes = min(num_bytes, self.capacity)
+        with self._condition:
+            while self.in_flight > 0 and self.in_flight + num_bytes > self.capacity:
+                self._condition.wait()
+            self.in_flight += num_bytes
+        return num_bytes
+
+    def release(self, num_bytes):
+        with self._condition:
+            self.in_flight -= num_bytes
+            self._condition.notify_all()
+
+
+class PositionalFile(object):
+    """
+    A local file preallocated to ``size`` bytes that many threads can write into at arbitrary
+    offsets. Uses ``os.pwrite`` where available and a lock around seek and write otherwise.
+    """
+    def __init__(self, path, size, keep_contents=False):
+        self._file = open(path, 'r+b' if keep_contents and os.path.isfile(path) else 'wb')
+        self._file.truncate(size)
+        self._lock = Lock()
+
+    def write_at(self, offset, data):
+        if hasattr(os, 'pwrite'):
+            written = 0
+            view = memoryview(data)
+            while written < len(view):
+                written += os.pwrite(self._file.fileno(), view[written:], offset + written)
+        else:
+            with self._lock:
+                self._file.seek(offset)
+                self._file.write(data)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class MappedFile(object):
+    """
+    A memory map of a local file. Without a ``size``, the existing file is mapped read only and
+    ``blocks`` yields views of it that can be sent without copying. With a ``size``, the file is
+    preallocated to that many bytes and many threads can fill the mapping in place at arbitrary
+    offsets, with the same write interface as PositionalFile.
+    """
+    def __init__(self, path, size=None, keep_contents=False):
+        if size is None:
+            self._file = open(path, 'rb')
+            self.size = os.fstat(self._file.fileno()).st_size
+            access = mmap.ACCESS_READ
+        else:
+            self._file = open(path, 'r+b' if keep_contents and os.path.isfile(path) else 'w+b')
+            self._file.truncate(size)
+            self.size = size
+            access = mmap.ACCESS_WRITE
+        # Empty files cannot be mapped.
+        self._map = mmap.mmap(self._file.fileno(), self.size, access=access) \
+            if self.size > 0 else None
+
+    def blocks(self, block_size, start=0):
+        """
+        Yields views of consecutive blocks of the file from ``start``. Each view is released
+        when the next one is requested, so a block must be consumed before moving on.
+        """
+        if self._map is None:
+            return
+        if six.PY2:
+            for offset in range(start, self.size, block_size):
+                yield buffer(self._map, offset, block_size) # noqa
+            return
+        whole = memoryview(self._map)
+        try:
+            for offset in range(start, self.size, block_size):
+                view = whole[offset:offset + block_size]
+                try:
+                    yield view
+                finally:
+                    view.release()
+        finally:
+            whole.release()
+
+    def write_at(self, offset, data):
+        self._map[offset:offset + len(data)] = data
+
+    def flush(self):
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def prefetch(iterable, depth):
+    """
+    Yields the items of ``iterable`` while a background thread produces up to ``depth`` items
+    ahead of the consumer. An exception raised while producing is re-raised to the consumer.
+    Closing the returned generator stops the producer and closes ``iterable``, so resources
+    that ``iterable`` holds are released by the time it returns.
+    """
+    queue = Queue(maxsize=depth)
+    stopped = Event()
+
+    def _put(entry):
+        while not stopped.is_set():
+            try:
+                queue.put(entry, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put((item, None)):
+                    return
+            _put((_END_OF_STREAM, None))
+        except Exception as e: # noqa
+            _put((_END_OF_STREAM, e))
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    producer = Thread(target=_produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            item, error = queue.get()
+            if item is _END_OF_STREAM:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+class DownloadCheckpoint(object):
+    """
+    A ``.partial`` sidecar next to a file being downloaded. It records the source, its size and
+    the offset below which every byte has already been written locally, so that an interrupted
+    download can continue from that offset.
+    """
+    SUFFIX = '.partial'
+
+    def __init__(self, dst_path, src, file_size):
+        self.path = dst_path + self.SUFFIX
+        self.dst_path = dst_path
+        self.src = src
+        self.file_size = file_size
+
+    @classmethod
+    def exists_for(cls, dst_path):
+        return os.path.isfile(dst_path + cls.SUFFIX)
+
+    def load_offset(self):
+        """
+        Returns the offset to resume from, or 0 if there is no usable checkpoint for this
+        source and size.
+        """
+        if not os.path.isfile(self.path) or not os.path.isfile(self.dst_path):
+            return 0
+        try:
+            with open(self.path, 'r') as f:
+                checkpoint = json.load(f)
+        except ValueError:
+            return 0
+        if checkpoint.get('src') != self.src or checkpoint.get('file_size') != self.file_size:
+            return 0
+        return min(checkpoint.get('offset', 0), os.path.getsize(self.dst_path))
+
+    def save(self, offset):
+        with open(self.path, 'w') as f:
+            json.dump({'src': self.src, 'file_size': self.file_size, 'offset': offset}, f)
+
+    def remove(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+class TransferJournal(object):
+    """
+    An append-only record of the files a recursive copy from src to dst has completed, one
+    destination path string per line. Journals are kept in the CLI state directory, keyed by src
+    and dst, never in the trees being copied. When resuming, files already in the journal are
+    skipped. The journal is created when the first file completes and is removed once a copy
+    finishes without failures. If it cannot be written, the copy goes on without it.
+    """
+    DIR_NAME = 'journals'
+
+    def __init__(self, src, dst, resume):
+        self.path = self.path_for(src, dst)
+        self.completed = set()
+        self._file = None
+        self._disabled = False
+        if resume and os.path.isfile(self.path):
+            with open(self.path, 'r') as f:
+                self.completed = set(line.rstrip('\n') for line in f if line.strip())
+        elif not resume:
+            self._remove()
+
+    @classmethod
+    def path_for(cls, src, dst):
+        key = hashlib.sha1(u'{}\n{}'.format(src, dst).encode('utf-8')).hexdigest()
+        return os.path.join(get_state_dir(), cls.DIR_NAME, key)
+
+    def is_completed(self, dst):
+        return dst in self.completed
+
+    def record(self, dst):
+        if self._disabled:
+            return
+        try:
+            if self._file is None:
+                if not os.path.isdir(os.path.dirname(self.path)):
+                    os.makedirs(os.path.dirname(self.path))
+                self._file = open(self.path, 'a')
+            self._file.write(dst + '\n')
+            self._file.flush()
+        except (IOError, OSError) as e:
+            self._disabled = True
+            click.echo('Cannot record progress in {}, this copy will not be resumable: {}'.format(
+                self.path, e), err=True)
+
+    def close(self, succeeded):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if succeeded:
+            self._remove()
+
+    def _remove(self):
+        try:
+            if os.path.isfile(self.path):
+                os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ScheduleSummary(object):
+    """
+    Timing of one SizeAwareScheduler run. ``critical_path`` is the longest time a single item
+    took: no schedule can finish sooner than that, however many workers there are.
+    """
+    def __init__(self, parallelism):
+        self.parallelism = parallelism
+        self.num_items = 0
+        self.total_bytes = 0
+        self.wall_time = 0.0
+        self.busy_times = [0.0] * parallelism
+        self.critical_path = 0.0
+        self.critical_item = None
+
+    @property
+    def utilization(self):
+        if self.wall_time <= 0:
+            return 0.0
+        return sum(self.busy_times) / (self.parallelism * self.wall_time)
+
+    def __str__(self):
+        return ('{} items, {} bytes in {:.1f}s with {} workers: {:.0%} utilization, '
+                'critical path {:.1f}s').format(self.num_items, self.total_bytes, self.wall_time,
+                                                self.parallelism, self.utilization,
+                                                self.critical_path)
+
+
+class SizeAwareScheduler(object):
+    """
+    Runs a function over sized items on a pool of worker threads, ordered to minimize the
+    time the last worker finishes.
+
+    Large items are handed out largest first, so that the biggest item never starts last
+    while every other worker sits idle. Small items are latency bound, so they are grouped in
+    batches, and each worker takes a batch of them after each large item so that small requests
+    keep flowing while large ones stream. Per-worker throughput is measured as items complete,
+    and a worker that is much slower than the fastest one only gets small batches while any
+    remain, to keep it off the critical path.
+    """
+    def __init__(self, parallelism, size_of, small_item_bytes=SMALL_ITEM_BYTES,
+                 batch_items=SMALL_BATCH_ITEMS):
+        self.parallelism = max(1, parallelism)
+        self.size_of = size_of
+        self.small_item_bytes = small_item_bytes
+        self.batch_items = batch_items
+        self.summary = ScheduleSummary(self.parallelism)
+        self._lock = Lock()
+        self._large = []
+        self._small_batches = []
+        self._took_large = [False] * self.parallelism
+        self._bytes_done = [0] * self.parallelism
+
+    def _prepare(self, items):
+        sized = [(self.size_of(item), item) for item in items]
+        self.summary.num_items = len(sized)
+        self.summary.total_bytes = sum(size for size, _ in sized)
+        large = [pair for pair in sized if pair[0] > self.small_item_bytes]
+        large.sort(key=lambda pair: pair[0], reverse=True)
+        small = [pair for pair in sized if pair[0] <= self.small_item_bytes]
+        # Lists are popped from the end.
+        self._large = list(reversed(large))
+        self._small_batches = list(reversed(
+            [small[i:i + self.batch_items] for i in range(0, len(small), self.batch_items)]))
+
+    def _throughput(self, worker):
+        busy = self.summary.busy_times[worker]
+        return self._bytes_done[worker] / busy if busy > 0 else None
+
+    def _is_slow(self, worker):
+        throughput = self._throughput(worker)
+        if throughput is None:
+            return False
+        fastest = max(t for t in (self._throughput(w) for w in range(self.parallelism))
+                      if t is not None)
+        return throughput < SLOW_WORKER_RATIO * fastest
+
+    def _next_job(self, worker):
+        with self._lock:
+            prefer_small = self._small_batches and (self._took_large[worker] or
+                                                    self._is_slow(worker))
+            if self._large and not prefer_small:
+                self._took_large[worker] = True
+                return [self._large.pop()]
+            if self._small_batches:
+                self._took_large[worker] = False
+                return self._small_batches.pop()
+            return None
+
+    def _record(self, worker, size, item, elapsed):
+        with self._lock:
+            self.summary.busy_times[worker] += elapsed
+            self._bytes_done[worker] += size
+            if elapsed > self.summary.critical_path:
+                self.summary.critical_path = elapsed
+                self.summary.critical_item = item
+
+    def run(self, fn, items):
+        """
+        Calls ``fn`` on each item and yields ``(item, return_value, exception)`` tuples in the
+        order the calls complete, like run_in_parallel. ``summary`` is complete once the
+        generator is exhausted.
+        """
+        self._prepare(items)
+        results = Queue()
+        stopped = Event()
+
+        def _work(worker):
+            while not stopped.is_set():
+                job = self._next_job(worker)
+                if job is None:
+                    break
+                for size, item in job:
+                    start = time.time()
+                    try:
+                        result = (item, fn(item), None)
+                    except Exception as e: # noqa
+                        result = (item, None, e)
+                    self._record(worker, size, item, time.time() - start)
+                    results.put(result)
+            results.put(_END_OF_STREAM)
+
+        start = time.time()
+        workers = [Thread(target=_work, args=(i,)) for i in range(self.parallelism)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        try:
+            running = len(workers)
+            while running:
+                result = results.get()
+                if result is _END_OF_STREAM:
+                    running -= 1
+                else:
+                    yield result
+        finally:
+            stopped.set()
+            for worker in workers:
+                worker.join()
+            self.summary.wall_time = time.time() - start
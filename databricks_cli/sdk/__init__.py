@@ -52,4 +52,4 @@ To get started, below is an example usage of the Python API client.
   help(JobsService)
 """
 from .service import *
-from .api_client import ApiClient
+from .api_client import ApiClient, RetryPolicy
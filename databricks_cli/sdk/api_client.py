@@ -30,10 +30,15 @@ A common class to be used by client of different APIs
 
 import base64
 import json
+import math
+import random
+import time
 import warnings
 import requests
 import ssl
 
+from email.utils import parsedate_tz, mktime_tz
+
 from . import version
 
 from requests.adapters import HTTPAdapter
@@ -47,6 +52,9 @@ except ImportError:
 
 from databricks_cli.version import version as databricks_cli_version
 
+# Parallel transfers share one session, so keep enough pooled connections for them.
+HTTP_POOL_MAXSIZE = 64
+
 class TlsV1HttpAdapter(HTTPAdapter):
     """
     A HTTP adapter implementation that specifies the ssl version to be TLS1.
@@ -57,18 +65,85 @@ class TlsV1HttpAdapter(HTTPAdapter):
     def init_poolmanager(self, connections, maxsize, block=False):
         self.poolmanager = PoolManager(num_pools=connections, maxsize=maxsize, block=block, ssl_version=ssl.PROTOCOL_TLSv1_2)
 
+class RetryPolicy(object):
+    """
+    Describes when and how long ApiClient.perform_query waits before retrying a request.
+
+    Requests rejected with a 429 are always safe to retry since the server did not act on them.
+    Other retryable status codes and connection errors are only retried for idempotent methods,
+    so that a request which may have been applied server side is never replayed. A server that
+    asks to wait longer than ``max_retry_after`` seconds is not retried at all.
+    """
+    RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+    THROTTLED_STATUS_CODE = 429
+
+    def __init__(self, max_retries=6, backoff_factor=0.5, max_backoff=60, max_retry_after=300,
+                 status_codes=RETRY_STATUS_CODES, idempotent_methods=IDEMPOTENT_METHODS):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.status_codes = frozenset(status_codes)
+        self.idempotent_methods = frozenset(m.upper() for m in idempotent_methods)
+
+    def is_idempotent(self, method):
+        return method.upper() in self.idempotent_methods
+
+    def should_retry_status(self, method, status_code, attempt, retry_after=None):
+        if attempt >= self.max_retries or status_code not in self.status_codes:
+            return False
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return False
+        return status_code == self.THROTTLED_STATUS_CODE or self.is_idempotent(method)
+
+    def should_retry_error(self, method, attempt):
+        return attempt < self.max_retries and self.is_idempotent(method)
+
+    def get_backoff(self, attempt, retry_after=None):
+        """
+        Exponential backoff with full jitter. A Retry-After sent by the server is a lower bound.
+        """
+        backoff = random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+        if retry_after is not None:
+            backoff = max(backoff, retry_after)
+        return backoff
+
+    @staticmethod
+    def parse_retry_after(value):
+        """
+        Returns the number of seconds described by a Retry-After header, or None if it is
+        missing or malformed. The header can be either a number of seconds or an HTTP date.
+        """
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            pass
+        else:
+            if math.isinf(seconds) or math.isnan(seconds):
+                return None
+            return max(0.0, seconds)
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, mktime_tz(parsed) - time.time())
+
+
 class ApiClient(object):
     """
     A partial Python implementation of dbc rest api
     to be used by different versions of the client.
     """
     def __init__(self, user=None, password=None, host=None, token=None,
-                 apiVersion=version.API_VERSION, default_headers={}, verify=True, command_name=""):
+                 apiVersion=version.API_VERSION, default_headers={}, verify=True, command_name="",
+                 retry_policy=None):
         if host[-1] == "/":
             host = host[:-1]
 
         self.session = requests.Session()
-        self.session.mount('https://', TlsV1HttpAdapter())
+        self.session.mount('https://', TlsV1HttpAdapter(pool_maxsize=HTTP_POOL_MAXSIZE))
 
         self.url = "%s/api/%s" % (host, apiVersion)
         if user is not None and password is not None:
@@ -86,6 +161,7 @@ class ApiClient(object):
         self.default_headers.update(default_headers)
         self.default_headers.update(user_agent)
         self.verify = verify
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
 
     def close(self):
         """Close the client"""
@@ -93,15 +169,38 @@ class ApiClient(object):
 
     # helper functions starting here
 
-    def perform_query(self, method, path, data = {}, headers = None):
-        """set up connection and perform query"""
+    def perform_query(self, method, path, data = {}, headers = None, body = None):
+        """set up connection and perform query
+
+        ``body`` is an already serialized JSON request body. When given, it is sent as is and
+        ``data`` is ignored, so callers with large payloads can avoid another copy through
+        json.dumps.
+        """
         if headers is None:
             headers = self.default_headers
-
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", exceptions.InsecureRequestWarning)
-            resp = self.session.request(method, self.url + path, data = json.dumps(data),
-                verify = self.verify, headers = headers)
+        if body is None:
+            body = json.dumps(data)
+
+        attempt = 0
+        while True:
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", exceptions.InsecureRequestWarning)
+                    resp = self.session.request(method, self.url + path, data = body,
+                        verify = self.verify, headers = headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not self.retry_policy.should_retry_error(method, attempt):
+                    raise
+                time.sleep(self.retry_policy.get_backoff(attempt))
+                attempt += 1
+                continue
+            retry_after = RetryPolicy.parse_retry_after(resp.headers.get('Retry-After'))
+            if self.retry_policy.should_retry_status(method, resp.status_code, attempt,
+                                                     retry_after):
+                time.sleep(self.retry_policy.get_backoff(attempt, retry_after))
+                attempt += 1
+                continue
+            break
 
         try:
             resp.raise_for_status()
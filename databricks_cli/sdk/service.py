@@ -460,6 +460,11 @@ class DbfsService(object):
             _data['data'] = data
         return self.client.perform_query('POST', '/dbfs/add-block', data=_data)
     
+    def add_block_raw(self, body):
+        # body is the add-block request already serialized, e.g. by
+        # databricks_cli.dbfs.transfer.add_block_body.
+        return self.client.perform_query('POST', '/dbfs/add-block', body=body)
+    
     def close(self, handle):
         _data = {}
         if handle is not None:
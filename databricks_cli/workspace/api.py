@@ -21,20 +21,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 import os
 from base64 import b64encode, b64decode
 
 import click
 from requests.exceptions import HTTPError
 
-from databricks_cli.dbfs.exceptions import LocalFileExistsException
+from databricks_cli.dbfs.exceptions import LocalFileExistsException, TransferFailedException
+from databricks_cli.dbfs.sync import SyncManifest
+from databricks_cli.dbfs.transfer import SizeAwareScheduler, TransferResult, crawl, \
+    report_transfers, run_in_parallel, DEFAULT_PARALLELISM
 from databricks_cli.sdk import WorkspaceService
+from databricks_cli.workspace.dbc import DbcWriter, read_dbc
 from databricks_cli.workspace.types import WorkspaceFormat, WorkspaceLanguage
 
 DIRECTORY = 'DIRECTORY'
 NOTEBOOK = 'NOTEBOOK'
 LIBRARY = 'LIBRARY'
 
+RESOURCE_DOES_NOT_EXIST = 'RESOURCE_DOES_NOT_EXIST'
+
 
 class WorkspaceFileInfo(object):
     def __init__(self, path, object_type, language=None):
@@ -76,6 +83,34 @@ class WorkspaceFileInfo(object):
         return cls(**deserialized_json)
 
 
+class WorkspaceTransferSummary(object):
+    """
+    The per-file results of a directory import or export, as TransferResults.
+    """
+    def __init__(self, verb):
+        self.verb = verb
+        self.results = []
+
+    def add(self, result):
+        self.results.append(result)
+
+    @property
+    def transferred(self):
+        return [r for r in self.results if r.ok and not r.skipped]
+
+    @property
+    def skipped(self):
+        return [r for r in self.results if r.skipped]
+
+    @property
+    def failures(self):
+        return [r for r in self.results if not r.ok]
+
+    def __str__(self):
+        return '{} {} files, skipped {}, {} failed.'.format(
+            self.verb, len(self.transferred), len(self.skipped), len(self.failures))
+
+
 class WorkspaceApi(object):
     def __init__(self, api_client):
         self.client = WorkspaceService(api_client)
@@ -124,52 +159,334 @@ class WorkspaceApi(object):
     def delete(self, workspace_path, is_recursive):
         self.client.delete(workspace_path, is_recursive)
 
-    def import_workspace_dir(self, source_path, target_path, overwrite, exclude_hidden_files):
-        filenames = os.listdir(source_path)
-        if exclude_hidden_files:
-            # for now, just exclude hidden files or directories based on starting '.'
-            filenames = [f for f in filenames if not f.startswith('.')]
+    def import_workspace_dir(self, source_path, target_path, overwrite, exclude_hidden_files,
+                             parallelism=DEFAULT_PARALLELISM):
+        """
+        Returns a WorkspaceTransferSummary. Raises a TransferFailedException at the end if any
+        notebook failed.
+        """
+        summary = WorkspaceTransferSummary('Imported')
+        dirs, notebooks = self._walk_local_notebooks(source_path, target_path,
+                                                     exclude_hidden_files, summary)
         try:
             self.mkdirs(target_path)
         except HTTPError as e:
             click.echo(e.response.json())
-            return
-        for filename in filenames:
-            cur_src = os.path.join(source_path, filename)
+            return summary
+        for depth in sorted(set(dst.count('/') for dst in dirs)):
+            level = [dst for dst in dirs if dst.count('/') == depth]
+            for dst, _, e in run_in_parallel(self.mkdirs, level, parallelism):
+                if e is not None:
+                    summary.add(TransferResult(None, dst, error=e))
+        self._import_notebooks(notebooks, overwrite, parallelism, summary)
+        click.echo(summary)
+        if summary.failures:
+            raise TransferFailedException(summary.failures, len(summary.results))
+        return summary
+
+    def _import_notebooks(self, notebooks, overwrite, parallelism, summary):
+        """
+        Imports ``(local path, workspace path)`` pairs and adds their results to summary.
+        """
+        def _import(notebook):
+            self._import_notebook(notebook[0], notebook[1], overwrite)
+
+        scheduler = SizeAwareScheduler(parallelism, lambda notebook: os.path.getsize(notebook[0]))
+        for _, result in report_transfers(scheduler.run(_import, notebooks), 'import',
+                                          lambda notebook: notebook):
+            summary.add(result)
+        if parallelism > 1:
+            click.echo(str(scheduler.summary))
+
+    def import_workspace_dir_bulk(self, source_path, target_path, exclude_hidden_files,
+                                  parallelism=DEFAULT_PARALLELISM):
+        """
+        Imports source_path as the new directory target_path through one DBC archive. Files the
+        archive cannot hold, or all of them if it is rejected, are imported one at a time.
+        """
+        summary = WorkspaceTransferSummary('Imported')
+        _, notebooks = self._walk_local_notebooks(source_path, target_path,
+                                                  exclude_hidden_files, summary)
+        archive, packed, separate = self._pack_notebooks(notebooks, target_path)
+        if packed:
+            try:
+                self.mkdirs(target_path.rstrip('/').rsplit('/', 1)[0] or '/')
+                self.client.import_workspace(target_path, WorkspaceFormat.DBC, None,
+                                             b64encode(archive.getvalue()).decode(), False)
+            except HTTPError as e:
+                click.echo('Could not import {} as one archive, importing notebooks one at a '
+                           'time: {}'.format(source_path, e))
+                separate = packed + separate
+            else:
+                for cur_src, cur_dst in packed:
+                    click.echo('{} -> {}'.format(cur_src, cur_dst))
+                    summary.add(TransferResult(cur_src, cur_dst))
+        parents = set(cur_dst.rsplit('/', 1)[0] or '/' for _, cur_dst in separate)
+        for _ in run_in_parallel(self.mkdirs, parents, parallelism):
+            pass
+        self._import_notebooks(separate, False, parallelism, summary)
+        click.echo(summary)
+        if summary.failures:
+            raise TransferFailedException(summary.failures, len(summary.results))
+        return summary
+
+    @staticmethod
+    def _pack_notebooks(notebooks, target_path):
+        """
+        Packs the SOURCE notebooks into a DBC archive for target_path. Returns ``(archive,
+        packed, separate)``: the archive as a BytesIO, the notebooks in it, and the ones that
+        must be imported one at a time.
+        """
+        prefix = target_path.rstrip('/') + '/'
+        root_name = target_path.rstrip('/').split('/')[-1]
+        packed = []
+        separate = []
+        archive = io.BytesIO()
+        with DbcWriter(archive) as dbc:
+            for cur_src, cur_dst in notebooks:
+                (language, file_format) = WorkspaceLanguage.to_language_and_format(cur_src)
+                if file_format != WorkspaceFormat.SOURCE:
+                    separate.append((cur_src, cur_dst))
+                    continue
+                with open(cur_src, 'rb') as f:
+                    try:
+                        source = f.read().decode('utf-8')
+                    except UnicodeDecodeError:
+                        separate.append((cur_src, cur_dst))
+                        continue
+                dbc.add_notebook(root_name + '/' + cur_dst[len(prefix):], language, source)
+                packed.append((cur_src, cur_dst))
+        return archive, packed, separate
+
+    def _import_notebook(self, cur_src, cur_dst, overwrite):
+        (language, file_format) = WorkspaceLanguage.to_language_and_format(cur_src)
+        self.import_workspace(cur_src, cur_dst, language, file_format, overwrite)
+
+    @staticmethod
+    def _walk_local_notebooks(source_path, target_path, exclude_hidden_files, summary):
+        """
+        Returns the workspace paths of the directories under source_path and the ``(local path,
+        workspace path)`` pairs of its notebooks.
+        """
+        dirs = []
+        notebooks = []
+        for cur_dir, dirnames, filenames in os.walk(source_path, followlinks=True):
+            if exclude_hidden_files:
+                # for now, just exclude hidden files or directories based on starting '.'
+                dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                filenames = [f for f in filenames if not f.startswith('.')]
+            rel_dir = os.path.relpath(cur_dir, source_path)
             # don't use os.path.join here since it will set \ on Windows
-            cur_dst = target_path.rstrip('/') + '/' + filename
-            if os.path.isdir(cur_src):
-                self.import_workspace_dir(cur_src, cur_dst, overwrite, exclude_hidden_files)
-            elif os.path.isfile(cur_src):
+            cur_target = target_path.rstrip('/')
+            if rel_dir != os.curdir:
+                cur_target += '/' + '/'.join(rel_dir.split(os.sep))
+            dirs.extend(cur_target + '/' + d for d in dirnames)
+            for filename in filenames:
+                cur_src = os.path.join(cur_dir, filename)
+                if not os.path.isfile(cur_src):
+                    continue
                 ext = WorkspaceLanguage.get_extension(cur_src)
                 if ext != '':
-                    cur_dst = cur_dst[:-len(ext)]
-                    (language, file_format) = WorkspaceLanguage.to_language_and_format(cur_src)
-                    self.import_workspace(cur_src, cur_dst, language, file_format, overwrite)
-                    click.echo('{} -> {}'.format(cur_src, cur_dst))
+                    notebooks.append((cur_src, cur_target + '/' + filename[:-len(ext)]))
                 else:
                     extensions = ', '.join(WorkspaceLanguage.EXTENSIONS)
                     click.echo(('{} does not have a valid extension of {}. Skip this file and ' +
                                 'continue.').format(cur_src, extensions))
+                    summary.add(TransferResult(cur_src, None, skipped=True))
+        return dirs, notebooks
 
-    def export_workspace_dir(self, source_path, target_path, overwrite):
-        if os.path.isfile(target_path):
-            click.echo('{} exists as a file. Skipping this subtree {}'
-                       .format(target_path, source_path))
-            return
-        if not os.path.isdir(target_path):
-            os.makedirs(target_path)
-        for obj in self.list_objects(source_path):
-            cur_src = obj.path
-            cur_dst = os.path.join(target_path, obj.basename)
-            if obj.is_dir:
-                self.export_workspace_dir(cur_src, cur_dst, overwrite)
-            elif obj.is_notebook:
-                cur_dst = cur_dst + WorkspaceLanguage.to_extension(obj.language)
-                try:
-                    self.export_workspace(cur_src, cur_dst, WorkspaceFormat.SOURCE, overwrite)
-                    click.echo('{} -> {}'.format(cur_src, cur_dst))
-                except LocalFileExistsException:
-                    click.echo('{} already exists locally as {}. Skip.'.format(cur_src, cur_dst))
+    def sync_workspace_dir(self, source_path, target_path, delete=False,
+                           parallelism=DEFAULT_PARALLELISM, manifest_path=None,
+                           exclude_hidden_files=False):
+        """
+        Imports the notebooks that changed since the last sync recorded in the manifest. With
+        delete, notebooks it imported whose local files were removed are deleted.
+        """
+        if manifest_path is None:
+            manifest_path = SyncManifest.path_for(source_path, target_path)
+        manifest = SyncManifest.load(manifest_path, target_path)
+        to_import, unchanged = self._diff_sync(source_path, target_path, exclude_hidden_files,
+                                               manifest)
+        extras = self._stale_keys(manifest, to_import, unchanged) if delete else []
+        scheduler = SizeAwareScheduler(parallelism, lambda item: os.path.getsize(item[1]))
+        failures = []
+        try:
+            num_imported = self._sync_imports(scheduler, to_import, manifest, failures,
+                                              parallelism)
+            num_deleted = self._sync_deletes(target_path, extras, parallelism, manifest,
+                                             failures)
+        finally:
+            manifest.save()
+        if parallelism > 1:
+            click.echo(str(scheduler.summary))
+        click.echo('{} imported, {} unchanged, {} deleted, {} failed.'.format(
+            num_imported, len(unchanged), num_deleted, len(failures)))
+        if failures:
+            raise TransferFailedException(failures, len(to_import) + len(extras))
+
+    def _diff_sync(self, source_path, target_path, exclude_hidden_files, manifest):
+        """
+        Returns ``(to_import, unchanged)``: the ``(key, src, dst, sha256)`` of every notebook
+        whose content changed since the last sync, and the keys of the others.
+        """
+        summary = WorkspaceTransferSummary('Imported')
+        _, notebooks = self._walk_local_notebooks(source_path, target_path,
+                                                  exclude_hidden_files, summary)
+        prefix = target_path.rstrip('/') + '/'
+        keys = set()
+        to_import = []
+        unchanged = []
+        for cur_src, cur_dst in notebooks:
+            key = cur_dst[len(prefix):]
+            if key in keys:
+                click.echo('{} maps to the notebook {} of another file. Skip.'
+                           .format(cur_src, cur_dst))
+                summary.add(TransferResult(cur_src, cur_dst, skipped=True))
+                continue
+            keys.add(key)
+            sha256 = manifest.current_hash(key, cur_src)
+            if manifest.is_unchanged(key, sha256):
+                unchanged.append(key)
+                manifest.record(key, cur_src, sha256)
+            else:
+                to_import.append((key, cur_src, cur_dst, sha256))
+        return to_import, unchanged
+
+    @staticmethod
+    def _stale_keys(manifest, to_import, unchanged):
+        local_keys = set(unchanged).union(item[0] for item in to_import)
+        return [key for key in manifest.entries if key not in local_keys]
+
+    def _sync_imports(self, scheduler, to_import, manifest, failures, parallelism):
+        def _import(item):
+            _, cur_src, cur_dst, _ = item
+            self._import_notebook(cur_src, cur_dst, True)
+
+        # Only the directories of notebooks being imported are created. A directory that fails
+        # to be created surfaces as failed imports of the notebooks in it.
+        parents = set(item[2].rsplit('/', 1)[0] or '/' for item in to_import)
+        for _ in run_in_parallel(self.mkdirs, parents, parallelism):
+            pass
+
+        num_imported = 0
+        for item, result in report_transfers(scheduler.run(_import, to_import), 'import',
+                                             lambda item: (item[1], item[2])):
+            key, cur_src, _, sha256 = item
+            if result.ok:
+                manifest.record(key, cur_src, sha256)
+                num_imported += 1
+            else:
+                failures.append(result)
+        return num_imported
+
+    def _sync_deletes(self, target_path, extras, parallelism, manifest, failures):
+        prefix = target_path.rstrip('/') + '/'
+
+        def _delete(key):
+            try:
+                self.delete(prefix + key, False)
+            except HTTPError as e:
+                if e.response.json().get('error_code') != RESOURCE_DOES_NOT_EXIST:
+                    raise e
+
+        num_deleted = 0
+        for key, _, e in run_in_parallel(_delete, extras, parallelism):
+            if e is None:
+                manifest.forget(key)
+                num_deleted += 1
+                click.echo('Deleted {}'.format(prefix + key))
             else:
-                click.echo('{} is neither a dir or a notebook. Skip.'.format(cur_src))
+                click.echo('Failed to delete {}: {}'.format(prefix + key, e))
+                failures.append(TransferResult(None, prefix + key, error=e))
+        return num_deleted
+
+    def export_workspace_dir(self, source_path, target_path, overwrite,
+                             parallelism=DEFAULT_PARALLELISM):
+        """
+        Returns a WorkspaceTransferSummary. Raises a TransferFailedException at the end if any
+        notebook failed.
+        """
+        summary = WorkspaceTransferSummary('Exported')
+
+        def _prepare_dir(cur_src, cur_dst):
+            if os.path.isfile(cur_dst):
+                click.echo('{} exists as a file. Skipping this subtree {}'
+                           .format(cur_dst, cur_src))
+                summary.add(TransferResult(cur_src, cur_dst, skipped=True))
+                return False
+            if not os.path.isdir(cur_dst):
+                os.makedirs(cur_dst)
+            return True
+
+        def _expand(directory, listing):
+            dirs = []
+            notebooks = []
+            for obj in listing:
+                child_dst = os.path.join(directory[1], obj.basename)
+                if obj.is_dir:
+                    if _prepare_dir(obj.path, child_dst):
+                        dirs.append((obj.path, child_dst))
+                elif obj.is_notebook:
+                    notebooks.append((obj.path,
+                                      child_dst + WorkspaceLanguage.to_extension(obj.language)))
+                else:
+                    click.echo('{} is neither a dir or a notebook. Skip.'.format(obj.path))
+                    summary.add(TransferResult(obj.path, None, skipped=True))
+            return dirs, notebooks
+
+        def _export(notebook):
+            self.export_workspace(notebook[0], notebook[1], WorkspaceFormat.SOURCE, overwrite)
+
+        def _exists_message(cur_src, cur_dst, e):
+            if isinstance(e, LocalFileExistsException):
+                return '{} already exists locally as {}. Skip.'.format(cur_src, cur_dst)
+            return None
+
+        roots = [(source_path, target_path)] if _prepare_dir(source_path, target_path) else []
+        results = crawl(roots, lambda directory: self.list_objects(directory[0]), _expand,
+                        _export, parallelism)
+        for _, result in report_transfers(results, 'export', lambda item: item,
+                                          _exists_message):
+            summary.add(result)
+        click.echo(summary)
+        if summary.failures:
+            raise TransferFailedException(summary.failures, len(summary.results))
+        return summary
+
+    def export_workspace_dir_bulk(self, source_path, target_path, overwrite,
+                                  parallelism=DEFAULT_PARALLELISM):
+        """
+        Exports source_path as one DBC archive and unpacks it locally, falling back to
+        export_workspace_dir if the archive cannot be exported.
+        """
+        try:
+            output = self.client.export_workspace(source_path, WorkspaceFormat.DBC)
+        except HTTPError as e:
+            click.echo('Could not export {} as one archive, exporting notebooks one at a time: '
+                       '{}'.format(source_path, e))
+            return self.export_workspace_dir(source_path, target_path, overwrite, parallelism)
+        summary = WorkspaceTransferSummary('Exported')
+        root_name = source_path.rstrip('/').split('/')[-1]
+        for rel_path, language, source in read_dbc(b64decode(output['content']), root_name):
+            cur_src = source_path.rstrip('/') + '/' + rel_path
+            cur_dst = os.path.join(target_path, *rel_path.split('/')) + \
+                WorkspaceLanguage.to_extension(language)
+            if os.path.exists(cur_dst) and not overwrite:
+                click.echo('{} already exists locally as {}. Skip.'.format(cur_src, cur_dst))
+                summary.add(TransferResult(cur_src, cur_dst, skipped=True))
+                continue
+            try:
+                if not os.path.isdir(os.path.dirname(cur_dst)):
+                    os.makedirs(os.path.dirname(cur_dst))
+                with open(cur_dst, 'wb') as f:
+                    f.write(source.encode('utf-8'))
+            except (IOError, OSError) as e:
+                click.echo('Failed to export {} -> {}: {}'.format(cur_src, cur_dst, e))
+                summary.add(TransferResult(cur_src, cur_dst, error=e))
+                continue
+            click.echo('{} -> {}'.format(cur_src, cur_dst))
+            summary.add(TransferResult(cur_src, cur_dst))
+        click.echo(summary)
+        if summary.failures:
+            raise TransferFailedException(summary.failures, len(summary.results))
+        return summary
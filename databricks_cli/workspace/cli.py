@@ -28,6 +28,7 @@ from tabulate import tabulate
 from databricks_cli.utils import eat_exceptions, CONTEXT_SETTINGS
 from databricks_cli.version import print_version_callback, version
 from databricks_cli.configure.config import provide_api_client, profile_option, debug_option
+from databricks_cli.dbfs.transfer import DEFAULT_PARALLELISM
 from databricks_cli.workspace.api import WorkspaceApi
 from databricks_cli.workspace.types import LanguageClickType, FormatClickType, WorkspaceFormat, \
     WorkspaceLanguage
@@ -147,22 +148,36 @@ def delete_cli(api_client, workspace_path, recursive):
 @click.argument('source_path')
 @click.argument('target_path')
 @click.option('--overwrite', '-o', is_flag=True, default=False)
+@click.option('--parallelism', '-p', type=click.IntRange(min=1), default=DEFAULT_PARALLELISM,
+              help='Number of concurrent list and export requests.')
+@click.option('--bulk', is_flag=True, default=False,
+              help='Export the directory as a single DBC archive and unpack it locally.')
 @debug_option
 @profile_option
 @eat_exceptions
 @provide_api_client
-def export_dir_cli(api_client, source_path, target_path, overwrite):
+def export_dir_cli(api_client, source_path, target_path, overwrite, parallelism, bulk):
     """
     Recursively exports a directory from the Databricks workspace.
 
     Only directories and notebooks are exported. Notebooks are always exported in the SOURCE
     format. Notebooks will also have the extension of .scala, .py, .sql, or .r appended
     depending on the language type.
+
+    Directories are listed while notebooks are exported, each with up to --parallelism
+    requests at the same time. A summary is printed at the end.
+
+    With --bulk, the whole directory is exported in one request as a DBC archive, which is
+    unpacked into the same source files. If the archive cannot be exported, the notebooks are
+    exported one at a time instead.
     """
     workspace_api = WorkspaceApi(api_client)
     assert workspace_api.get_status(source_path).is_dir, 'The source path must be a directory. {}' \
         .format(source_path)
-    workspace_api.export_workspace_dir(source_path, target_path, overwrite)
+    if bulk:
+        workspace_api.export_workspace_dir_bulk(source_path, target_path, overwrite, parallelism)
+    else:
+        workspace_api.export_workspace_dir(source_path, target_path, overwrite, parallelism)
 
 
 @click.command(context_settings=CONTEXT_SETTINGS,
@@ -171,19 +186,68 @@ def export_dir_cli(api_client, source_path, target_path, overwrite):
 @click.argument('target_path')
 @click.option('--overwrite', '-o', is_flag=True, default=False)
 @click.option('--exclude-hidden-files', '-e', is_flag=True, default=False)
+@click.option('--parallelism', '-p', type=click.IntRange(min=1), default=DEFAULT_PARALLELISM,
+              help='Number of notebooks to import concurrently.')
+@click.option('--bulk', is_flag=True, default=False,
+              help='Import the directory as a single DBC archive built in memory.')
 @debug_option
 @profile_option
 @eat_exceptions
 @provide_api_client
-def import_dir_cli(api_client, source_path, target_path, overwrite, exclude_hidden_files):
+def import_dir_cli(api_client, source_path, target_path, overwrite, exclude_hidden_files,
+                   parallelism, bulk):
     """
     Recursively imports a directory from local to the Databricks workspace.
 
     Only directories and files with the extensions .scala, .py, .sql, .r, .R, .ipynb are imported.
     When imported, these extensions will be stripped off the name of the notebook.
+
+    Directories are created first, then up to --parallelism notebooks are imported at the same
+    time. A summary is printed at the end and notebooks that failed to import are reported.
+
+    With --bulk, the source notebooks are packed into one DBC archive and imported in a single
+    request, and .ipynb files are imported one at a time afterwards. The target directory must
+    not exist yet, so --bulk cannot be combined with --overwrite.
+    """
+    workspace_api = WorkspaceApi(api_client)
+    if bulk:
+        if overwrite:
+            raise click.UsageError('--bulk cannot be combined with --overwrite.')
+        workspace_api.import_workspace_dir_bulk(source_path, target_path, exclude_hidden_files,
+                                                parallelism)
+    else:
+        workspace_api.import_workspace_dir(source_path, target_path, overwrite,
+                                           exclude_hidden_files, parallelism)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               short_help='Incrementally imports a directory to the Databricks workspace.')
+@click.argument('source_path', type=click.Path(exists=True, file_okay=False))
+@click.argument('target_path')
+@click.option('--delete', is_flag=True, default=False,
+              help='Delete notebooks imported by an earlier sync whose files were removed.')
+@click.option('--exclude-hidden-files', '-e', is_flag=True, default=False)
+@click.option('--parallelism', '-p', type=click.IntRange(min=1), default=DEFAULT_PARALLELISM,
+              help='Number of notebooks to import concurrently.')
+@click.option('--manifest', default=None, type=click.Path(dir_okay=False),
+              help='Path of the sync manifest. Defaults to one kept in ~/.databricks-cli for '
+                   'this source and target.')
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+def sync_cli(api_client, source_path, target_path, delete, exclude_hidden_files, parallelism,
+             manifest):
+    """
+    Incrementally imports a directory from local to the Databricks workspace.
+
+    Files are mapped to notebooks like import_dir does. Only notebooks whose content changed
+    since the last sync are imported. Changes are detected by comparing content hashes with
+    the ones recorded in a manifest kept for each source and target pair. With --delete, notebooks
+    that an earlier sync imported and whose local files have since been removed are deleted.
     """
-    WorkspaceApi(api_client).import_workspace_dir(source_path, target_path, overwrite,
-                                                  exclude_hidden_files)
+    WorkspaceApi(api_client).sync_workspace_dir(source_path, target_path, delete, parallelism,
+                                                manifest, exclude_hidden_files)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
@@ -208,3 +272,4 @@ workspace_group.add_command(delete_cli, name='delete')
 workspace_group.add_command(delete_cli, name='rm')
 workspace_group.add_command(export_dir_cli, name='export_dir')
 workspace_group.add_command(import_dir_cli, name='import_dir')
+workspace_group.add_command(sync_cli, name='sync')
@@ -0,0 +1,175 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import posixpath
+import uuid
+import zipfile
+
+from databricks_cli.workspace.types import WorkspaceLanguage
+
+# Extensions of the notebook entries in a DBC archive.
+DBC_EXTENSIONS = {
+    '.python': WorkspaceLanguage.PYTHON,
+    '.scala': WorkspaceLanguage.SCALA,
+    '.sql': WorkspaceLanguage.SQL,
+    '.r': WorkspaceLanguage.R,
+}
+
+SOURCE_HEADER = 'Databricks notebook source'
+COMMAND_SEPARATOR = 'COMMAND ----------'
+MAGIC = 'MAGIC'
+TITLE = 'DBTITLE'
+
+NOTEBOOK_VERSION = 'NotebookV1'
+
+_COMMENT_PREFIXES = {
+    WorkspaceLanguage.PYTHON: '#',
+    WorkspaceLanguage.SCALA: '//',
+    WorkspaceLanguage.SQL: '--',
+    WorkspaceLanguage.R: '#',
+}
+
+
+def notebook_to_source(notebook, language):
+    """
+    Renders a notebook from a DBC archive in the SOURCE format: a header line, then the
+    commands in order, separated by COMMAND lines. Commands that start with a magic such as
+    ``%md`` have every line commented out with a MAGIC prefix. A command with a title starts
+    with a DBTITLE line, flagged 1 if the title is shown and 0 if it is hidden.
+    """
+    comment = _COMMENT_PREFIXES[language]
+    commands = sorted(notebook.get('commands', []), key=lambda c: c.get('position', 0))
+    cells = []
+    for command in commands:
+        text = command.get('command', '')
+        if text.startswith('%'):
+            text = '\n'.join('{} {} {}'.format(comment, MAGIC, line).rstrip()
+                             for line in text.split('\n'))
+        if command.get('commandTitle'):
+            text = '{} {} {},{}\n'.format(comment, TITLE,
+                                          1 if command.get('showCommandTitle') else 0,
+                                          command['commandTitle']) + text
+        cells.append(text)
+    separator = '\n\n{} {}\n\n'.format(comment, COMMAND_SEPARATOR)
+    return '{} {}\n'.format(comment, SOURCE_HEADER) + separator.join(cells) + '\n'
+
+
+def source_to_notebook(source, name, language):
+    """
+    Parses a notebook in the SOURCE format into the notebook document stored in a DBC archive.
+    This is the inverse of notebook_to_source: the header line is dropped, the commands are
+    split on COMMAND lines, a leading DBTITLE line becomes the command title, and MAGIC prefixes
+    are removed.
+    """
+    comment = _COMMENT_PREFIXES[language]
+    header = '{} {}'.format(comment, SOURCE_HEADER)
+    separator = '{} {}'.format(comment, COMMAND_SEPARATOR)
+    lines = source.replace('\r\n', '\n').split('\n')
+    if lines and lines[0].strip() == header:
+        lines = lines[1:]
+    cells = [[]]
+    for line in lines:
+        if line.strip() == separator:
+            cells.append([])
+        else:
+            cells[-1].append(line)
+    commands = [_cell_to_command(cell, comment, position)
+                for position, cell in enumerate(cells, 1)]
+    return {
+        'version': NOTEBOOK_VERSION,
+        'name': name,
+        'language': language.lower(),
+        'commands': commands,
+    }
+
+
+def _cell_to_command(cell, comment, position):
+    magic = '{} {}'.format(comment, MAGIC)
+    title = '{} {} '.format(comment, TITLE)
+    cell_lines = '\n'.join(cell).strip('\n').split('\n')
+    command = {
+        'position': position,
+        'guid': str(uuid.uuid4()),
+        'subtype': 'command',
+        'commandType': 'auto',
+    }
+    if cell_lines[0].startswith(title):
+        flag, _, command['commandTitle'] = cell_lines[0][len(title):].partition(',')
+        command['showCommandTitle'] = flag.strip() != '0'
+        cell_lines = cell_lines[1:]
+    text = '\n'.join(cell_lines)
+    if text and all(line.startswith(magic) for line in cell_lines):
+        text = '\n'.join(line[len(magic) + 1:] for line in cell_lines)
+    command['command'] = text
+    return command
+
+
+class DbcWriter(object):
+    """
+    Writes a DBC archive to the binary file object ``out``, one notebook at a time, so only
+    the compressed archive is held in memory.
+    """
+    def __init__(self, out):
+        self._archive = zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED)
+        self._extensions = dict((language, ext) for ext, language in DBC_EXTENSIONS.items())
+
+    def add_notebook(self, path, language, source):
+        """
+        Adds the SOURCE notebook ``source`` at the '/' separated path, which has no extension.
+        """
+        notebook = source_to_notebook(source, posixpath.basename(path), language)
+        self._archive.writestr(path + self._extensions[language],
+                               json.dumps(notebook).encode('utf-8'))
+
+    def close(self):
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_dbc(content, root_name):
+    """
+    Yields ``(relative path, language, source)`` for every notebook in the DBC archive
+    ``content``. Relative paths are '/' separated and have no extension. Entries are stored
+    under the name of the exported directory, root_name, which is stripped. Entries whose path
+    would escape the exported directory are ignored.
+    """
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        for name in archive.namelist():
+            base, ext = posixpath.splitext(name)
+            if ext not in DBC_EXTENSIONS:
+                continue
+            parts = base.split('/')
+            if root_name and len(parts) > 1 and parts[0] == root_name:
+                parts = parts[1:]
+            if any(part in ('', '.', '..') for part in parts):
+                continue
+            language = DBC_EXTENSIONS[ext]
+            notebook = json.loads(archive.read(name).decode('utf-8'))
+            yield '/'.join(parts), language, notebook_to_source(notebook, language)
@@ -38,7 +38,8 @@ setup(
         'requests>=2.17.3',
         'tabulate>=0.7.7',
         'six>=1.10.0',
-        'configparser >= 0.3.5'
+        'configparser >= 0.3.5',
+        'futures>=3.1.1;python_version<"3.0"'
     ],
     entry_points='''
         [console_scripts]
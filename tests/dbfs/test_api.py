@@ -22,16 +22,22 @@
 # limitations under the License.
 
 # pylint:disable=redefined-outer-name
-from base64 import b64encode
+from base64 import b64encode, b64decode
 
+import hashlib
+import io
+import json
 import os
 import requests
 import mock
 import pytest
 
 import databricks_cli.dbfs.api as api
+from databricks_cli.dbfs.artifacts import ArtifactIndex
 from databricks_cli.dbfs.dbfs_path import DbfsPath
-from databricks_cli.dbfs.exceptions import LocalFileExistsException
+from databricks_cli.dbfs.sync import SyncManifest
+from databricks_cli.dbfs.transfer import DownloadCheckpoint, TransferJournal
+from databricks_cli.dbfs.exceptions import LocalFileExistsException, TransferFailedException
 
 TEST_DBFS_PATH = DbfsPath('dbfs:/test')
 TEST_FILE_JSON = {
@@ -123,11 +129,26 @@ class TestDbfsApi(object):
         api_mock = dbfs_api.client
         test_handle = 0
         api_mock.create.return_value = {'handle': test_handle}
+        with mock.patch('databricks_cli.dbfs.api.SMALL_FILE_THRESHOLD_BYTES', 0):
+            dbfs_api.put_file(test_file_path, TEST_DBFS_PATH, True)
+
+        assert api_mock.add_block_raw.call_count == 1
+        body = json.loads(api_mock.add_block_raw.call_args[0][0].decode())
+        assert body == {'handle': test_handle, 'data': b64encode(b'test').decode()}
+
+    def test_put_file_small(self, dbfs_api, tmpdir):
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with open(test_file_path, 'wt') as f:
+            f.write('test')
+
+        api_mock = dbfs_api.client
         dbfs_api.put_file(test_file_path, TEST_DBFS_PATH, True)
 
-        assert api_mock.add_block.call_count == 1
-        assert test_handle == api_mock.add_block.call_args[0][0]
-        assert b64encode(b'test').decode() == api_mock.add_block.call_args[0][1]
+        assert api_mock.create.call_count == 0
+        assert api_mock.add_block_raw.call_count == 0
+        assert api_mock.put.call_count == 1
+        assert api_mock.put.call_args[0] == (TEST_DBFS_PATH.absolute_path,
+                                             b64encode(b'test').decode(), True)
 
     def test_get_file_check_overwrite(self, dbfs_api, tmpdir):
         test_file_path = os.path.join(tmpdir.strpath, 'test')
@@ -149,3 +170,591 @@ class TestDbfsApi(object):
 
         with open(test_file_path, 'r') as f:
             assert f.read() == 'x'
+
+    def _make_local_tree(self, tmpdir):
+        """
+        Creates a tree with this structure.
+        - a.txt
+        - b (directory)
+          - c.txt
+          - d (directory)
+            - e.txt
+        """
+        path = tmpdir.strpath
+        os.makedirs(os.path.join(path, 'b', 'd'))
+        for rel_path in ['a.txt', os.path.join('b', 'c.txt'), os.path.join('b', 'd', 'e.txt')]:
+            with open(os.path.join(path, rel_path), 'wt') as f:
+                f.write(rel_path)
+        return path
+
+    def test_copy_to_dbfs_recursive(self, dbfs_api, tmpdir):
+        path = self._make_local_tree(tmpdir)
+        dbfs_api.client.get_status.side_effect = get_resource_does_not_exist_exception()
+        dbfs_api.cp(True, False, path, 'dbfs:/dst', parallelism=4)
+
+        # mkdirs creates parents, so only the deepest directory is created explicitly.
+        mkdirs_paths = [ca[0][0] for ca in dbfs_api.client.mkdirs.call_args_list]
+        assert mkdirs_paths == ['dbfs:/dst/b/d']
+        put_paths = [ca[0][0] for ca in dbfs_api.client.put.call_args_list]
+        assert sorted(put_paths) == ['dbfs:/dst/a.txt', 'dbfs:/dst/b/c.txt',
+                                     'dbfs:/dst/b/d/e.txt']
+
+    def test_copy_to_dbfs_recursive_reports_failures(self, dbfs_api, tmpdir):
+        path = self._make_local_tree(tmpdir)
+        dbfs_api.client.get_status.side_effect = get_resource_does_not_exist_exception()
+
+        def _put(dbfs_path, contents, overwrite):
+            if dbfs_path.endswith('c.txt'):
+                raise RuntimeError('boom')
+
+        dbfs_api.client.put.side_effect = _put
+        with pytest.raises(TransferFailedException) as e:
+            dbfs_api.cp(True, False, path, 'dbfs:/dst', parallelism=2)
+        assert len(e.value.failures) == 1
+        assert e.value.failures[0].dst == DbfsPath('dbfs:/dst/b/c.txt')
+        # The other files were still uploaded.
+        assert dbfs_api.client.put.call_count == 3
+
+    def test_get_dir(self, dbfs_api, tmpdir):
+        def _list(path):
+            if path == 'dbfs:/src':
+                return {'files': [
+                    {'path': '/src/a.txt', 'is_dir': False, 'file_size': 1},
+                    {'path': '/src/b', 'is_dir': True, 'file_size': 0},
+                ]}
+            elif path == 'dbfs:/src/b':
+                return {'files': [{'path': '/src/b/c.txt', 'is_dir': False, 'file_size': 1}]}
+            assert False, 'Unexpected listing of {}'.format(path)
+
+        dbfs_api.client.list.side_effect = _list
+        dbfs_api.client.read.return_value = {
+            'bytes_read': 1,
+            'data': b64encode(b'x'),
+        }
+        dst = os.path.join(tmpdir.strpath, 'dst')
+        dbfs_api.get_dir(DbfsPath('dbfs:/src'), dst, False, parallelism=3, max_bytes_in_flight=1)
+
+        # The sizes from the listing are reused, so there is exactly one read per file.
+        assert dbfs_api.client.get_status.call_count == 0
+        assert dbfs_api.client.read.call_count == 2
+
+        with open(os.path.join(dst, 'a.txt')) as f:
+            assert f.read() == 'x'
+        with open(os.path.join(dst, 'b', 'c.txt')) as f:
+            assert f.read() == 'x'
+
+    def test_get_dir_reports_failures(self, dbfs_api, tmpdir):
+        dbfs_api.client.list.return_value = {'files': [
+            {'path': '/src/a.txt', 'is_dir': False, 'file_size': 1},
+            {'path': '/src/b.txt', 'is_dir': False, 'file_size': 1},
+        ]}
+
+        def _read(path, offset, length):
+            if path == 'dbfs:/src/a.txt':
+                raise RuntimeError('boom')
+            return {'bytes_read': 1, 'data': b64encode(b'x')}
+
+        dbfs_api.client.read.side_effect = _read
+        with pytest.raises(TransferFailedException) as e:
+            dbfs_api.get_dir(DbfsPath('dbfs:/src'), tmpdir.strpath, False, parallelism=2)
+        assert len(e.value.failures) == 1
+        assert e.value.total == 2
+        assert os.path.exists(os.path.join(tmpdir.strpath, 'b.txt'))
+
+    def test_copy_file_small(self, dbfs_api):
+        self._mock_read_of(dbfs_api, b'test')
+        dbfs_api.copy_file(TEST_DBFS_PATH, DbfsPath('dbfs:/dst'), True)
+        dbfs_api.client.put.assert_called_once_with('dbfs:/dst', b64encode(b'test').decode(), True)
+        assert dbfs_api.client.create.call_count == 0
+
+    def test_copy_file_streams_blocks(self, dbfs_api):
+        contents = b'0123456789'
+        self._mock_read_of(dbfs_api, contents)
+        dbfs_api.client.create.return_value = {'handle': 0}
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4), \
+                mock.patch('databricks_cli.dbfs.api.SMALL_FILE_THRESHOLD_BYTES', 0):
+            dbfs_api.copy_file(TEST_DBFS_PATH, DbfsPath('dbfs:/dst'), False)
+
+        dbfs_api.client.create.assert_called_once_with('dbfs:/dst', False)
+        uploaded = b''.join(b64decode(json.loads(ca[0][0].decode())['data'])
+                            for ca in dbfs_api.client.add_block_raw.call_args_list)
+        assert uploaded == contents
+        assert dbfs_api.client.close.call_count == 1
+
+    def test_cp_dbfs_to_dbfs_dir(self, dbfs_api):
+        def _list(path):
+            if path == 'dbfs:/src':
+                return {'files': [
+                    {'path': '/src/a.txt', 'is_dir': False, 'file_size': 1},
+                    {'path': '/src/b', 'is_dir': True, 'file_size': 0},
+                ]}
+            elif path == 'dbfs:/src/b':
+                return {'files': [{'path': '/src/b/c.txt', 'is_dir': False, 'file_size': 1}]}
+            assert False, 'Unexpected listing of {}'.format(path)
+
+        dbfs_api.client.get_status.return_value = {'path': '/src', 'is_dir': True, 'file_size': 0}
+        dbfs_api.client.list.side_effect = _list
+        dbfs_api.client.read.return_value = {'bytes_read': 1, 'data': b64encode(b'x')}
+        dbfs_api.cp(True, False, 'dbfs:/src', 'dbfs:/dst', parallelism=3)
+
+        assert sorted(ca[0][0] for ca in dbfs_api.client.mkdirs.call_args_list) == \
+            ['dbfs:/dst', 'dbfs:/dst/b']
+        assert sorted(ca[0][0] for ca in dbfs_api.client.put.call_args_list) == \
+            ['dbfs:/dst/a.txt', 'dbfs:/dst/b/c.txt']
+        # The sizes from the listing are reused for the files.
+        assert dbfs_api.client.get_status.call_count == 1
+
+    def test_cp_dbfs_to_dbfs_dir_reports_failures(self, dbfs_api):
+        dbfs_api.client.get_status.return_value = {'path': '/src', 'is_dir': True, 'file_size': 0}
+        dbfs_api.client.list.return_value = {'files': [
+            {'path': '/src/a.txt', 'is_dir': False, 'file_size': 1},
+            {'path': '/src/b.txt', 'is_dir': False, 'file_size': 1},
+        ]}
+
+        def _put(path, contents, overwrite):
+            if path == 'dbfs:/dst/a.txt':
+                raise RuntimeError('boom')
+
+        dbfs_api.client.read.return_value = {'bytes_read': 1, 'data': b64encode(b'x')}
+        dbfs_api.client.put.side_effect = _put
+        with pytest.raises(TransferFailedException) as e:
+            dbfs_api.cp(True, False, 'dbfs:/src', 'dbfs:/dst', parallelism=2)
+        assert len(e.value.failures) == 1
+        assert e.value.total == 2
+
+    def test_cp_dbfs_to_dbfs_file_into_dir(self, dbfs_api):
+        statuses = {
+            'dbfs:/src/a.txt': {'path': '/src/a.txt', 'is_dir': False, 'file_size': 1},
+            'dbfs:/dst': {'path': '/dst', 'is_dir': True, 'file_size': 0},
+        }
+        dbfs_api.client.get_status.side_effect = lambda path: statuses[path]
+        dbfs_api.client.read.return_value = {'bytes_read': 1, 'data': b64encode(b'x')}
+        dbfs_api.cp(False, False, 'dbfs:/src/a.txt', 'dbfs:/dst')
+        assert dbfs_api.client.put.call_args[0][0] == 'dbfs:/dst/a.txt'
+
+    def test_put_artifact_already_stored(self, dbfs_api, tmpdir):
+        path = os.path.join(tmpdir.strpath, 'lib.jar')
+        with open(path, 'wb') as f:
+            f.write(b'test')
+        dbfs_api.client.get_status.return_value = {'path': '/x', 'is_dir': False, 'file_size': 4}
+
+        dst = dbfs_api.put_artifact(path)
+
+        assert dst == DbfsPath('dbfs:/artifacts/sha256/{}/lib.jar'.format(
+            hashlib.sha256(b'test').hexdigest()))
+        assert dbfs_api.client.get_status.call_count == 1
+        assert dbfs_api.client.put.call_count == 0
+        assert dbfs_api.client.create.call_count == 0
+
+    def test_put_artifact_uploads_and_records(self, dbfs_api, tmpdir):
+        path = os.path.join(tmpdir.strpath, 'lib.jar')
+        with open(path, 'wb') as f:
+            f.write(b'test')
+        dbfs_api.client.get_status.side_effect = get_resource_does_not_exist_exception()
+        dbfs_api.client.create.return_value = {'handle': 0}
+
+        dst = dbfs_api.put_artifact(path, DbfsPath('dbfs:/store'))
+
+        dbfs_api.client.put.assert_called_once_with(
+            dst.absolute_path, b64encode(b'test').decode(), True)
+        dbfs_api.client.create.assert_called_once_with('dbfs:/store/index.json', True)
+        body = json.loads(dbfs_api.client.add_block_raw.call_args[0][0].decode())
+        index = ArtifactIndex.from_json(b64decode(body['data']))
+        assert index.paths_for(hashlib.sha256(b'test').hexdigest()) == [dst.absolute_path]
+
+    def test_get_file_ranged(self, dbfs_api, tmpdir):
+        contents = b'0123456789abcdefghij'
+        api_mock = dbfs_api.client
+        api_mock.get_status.return_value = {
+            'path': '/test',
+            'is_dir': False,
+            'file_size': len(contents)
+        }
+
+        def _read(path, offset, length):
+            # Return short reads to exercise the refill loop.
+            data = contents[offset:offset + min(length, 3)]
+            return {'bytes_read': len(data), 'data': b64encode(data)}
+
+        api_mock.read.side_effect = _read
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4):
+            dbfs_api.get_file(TEST_DBFS_PATH, test_file_path, True, parallelism=3)
+
+        with open(test_file_path, 'rb') as f:
+            assert f.read() == contents
+
+    def test_put_file_pipelined(self, dbfs_api, tmpdir):
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with open(test_file_path, 'wb') as f:
+            f.write(b'0123456789')
+
+        api_mock = dbfs_api.client
+        api_mock.create.return_value = {'handle': 0}
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4), \
+                mock.patch('databricks_cli.dbfs.api.SMALL_FILE_THRESHOLD_BYTES', 0):
+            dbfs_api.put_file(test_file_path, TEST_DBFS_PATH, True)
+
+        blocks = [json.loads(ca[0][0].decode())['data']
+                  for ca in api_mock.add_block_raw.call_args_list]
+        assert blocks == [b64encode(b'0123').decode(), b64encode(b'4567').decode(),
+                          b64encode(b'89').decode()]
+        assert api_mock.close.call_count == 1
+
+    def test_put_file_pipelined_add_block_fails(self, dbfs_api, tmpdir):
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with open(test_file_path, 'wb') as f:
+            f.write(b'0123456789')
+
+        api_mock = dbfs_api.client
+        api_mock.create.return_value = {'handle': 0}
+        api_mock.add_block_raw.side_effect = RuntimeError('boom')
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4), \
+                mock.patch('databricks_cli.dbfs.api.SMALL_FILE_THRESHOLD_BYTES', 0):
+            with pytest.raises(RuntimeError):
+                dbfs_api.put_file(test_file_path, TEST_DBFS_PATH, True)
+        assert api_mock.close.call_count == 0
+
+    def test_sync_prints_schedule_summary(self, dbfs_api, tmpdir, capsys):
+        path = self._make_local_tree(tmpdir)
+        dbfs_api.client.list.return_value = {}
+        dbfs_api.sync(path, DbfsPath('dbfs:/dst'), parallelism=2)
+        assert '3 items' in capsys.readouterr().out
+
+    def test_sync(self, dbfs_api, tmpdir):
+        path = self._make_local_tree(tmpdir)
+        remote = {}
+
+        def _list(dbfs_path):
+            if dbfs_path != 'dbfs:/dst':
+                return {}
+            return {'files': [{'path': p[len('dbfs:'):], 'is_dir': False, 'file_size': size}
+                              for p, size in remote.items()]}
+
+        def _put(dbfs_path, contents, overwrite):
+            remote[dbfs_path] = len(b64decode(contents))
+
+        dbfs_api.client.list.side_effect = _list
+        dbfs_api.client.put.side_effect = _put
+        dbfs_api.sync(path, DbfsPath('dbfs:/dst'))
+        assert dbfs_api.client.put.call_count == 3
+        assert os.path.exists(SyncManifest.path_for(path, 'dbfs:/dst'))
+        assert sorted(os.listdir(path)) == ['a.txt', 'b']
+
+        # Nothing changed, so nothing is uploaded again.
+        dbfs_api.client.put.reset_mock()
+        dbfs_api.sync(path, DbfsPath('dbfs:/dst'))
+        assert dbfs_api.client.put.call_count == 0
+
+        # Same size, different content.
+        with open(os.path.join(path, 'a.txt'), 'wt') as f:
+            f.write('A.txt')
+        os.utime(os.path.join(path, 'a.txt'), (0, 0))
+        dbfs_api.sync(path, DbfsPath('dbfs:/dst'))
+        assert dbfs_api.client.put.call_count == 1
+        assert dbfs_api.client.put.call_args[0][0] == 'dbfs:/dst/a.txt'
+
+    def test_sync_delete(self, dbfs_api, tmpdir):
+        dbfs_api.client.list.return_value = {'files': [
+            {'path': '/dst/extra.txt', 'is_dir': False, 'file_size': 1}
+        ]}
+        dbfs_api.sync(tmpdir.strpath, DbfsPath('dbfs:/dst'), delete=True)
+        assert dbfs_api.client.delete.call_count == 1
+        assert dbfs_api.client.delete.call_args[0][0] == 'dbfs:/dst/extra.txt'
+
+    def _mock_read_of(self, dbfs_api, contents):
+        dbfs_api.client.get_status.return_value = {
+            'path': '/test',
+            'is_dir': False,
+            'file_size': len(contents)
+        }
+
+        def _read(path, offset, length):
+            data = contents[offset:offset + length]
+            return {'bytes_read': len(data), 'data': b64encode(data)}
+
+        dbfs_api.client.read.side_effect = _read
+
+    def test_get_file_resume(self, dbfs_api, tmpdir):
+        contents = b'0123456789'
+        self._mock_read_of(dbfs_api, contents)
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with open(test_file_path, 'wb') as f:
+            f.write(b'0123xx')
+        DownloadCheckpoint(test_file_path, TEST_DBFS_PATH.absolute_path, len(contents)).save(4)
+
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4):
+            dbfs_api.get_file(TEST_DBFS_PATH, test_file_path, False, resume=True)
+
+        assert [ca[0][1] for ca in dbfs_api.client.read.call_args_list] == [4, 8]
+        with open(test_file_path, 'rb') as f:
+            assert f.read() == contents
+        assert not DownloadCheckpoint.exists_for(test_file_path)
+
+    def test_get_file_resume_stale_checkpoint(self, dbfs_api, tmpdir):
+        self._mock_read_of(dbfs_api, b'0123456789')
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with open(test_file_path, 'wb') as f:
+            f.write(b'precious data')
+        DownloadCheckpoint(test_file_path, 'dbfs:/other', 10).save(4)
+
+        with pytest.raises(LocalFileExistsException):
+            dbfs_api.get_file(TEST_DBFS_PATH, test_file_path, False, resume=True)
+        with open(test_file_path, 'rb') as f:
+            assert f.read() == b'precious data'
+
+    def test_cp_from_stdin(self, dbfs_api):
+        dbfs_api.client.create.return_value = {'handle': 0}
+        stdin = io.BytesIO(b'0123456789')
+        with mock.patch('databricks_cli.dbfs.api.click.get_binary_stream', return_value=stdin), \
+                mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4):
+            dbfs_api.cp(False, True, '-', 'dbfs:/test')
+
+        dbfs_api.client.create.assert_called_once_with('dbfs:/test', True)
+        uploaded = b''.join(b64decode(json.loads(ca[0][0].decode())['data'])
+                            for ca in dbfs_api.client.add_block_raw.call_args_list)
+        assert uploaded == b'0123456789'
+        assert dbfs_api.client.close.call_count == 1
+
+    def test_cp_to_stdout(self, dbfs_api):
+        self._mock_read_of(dbfs_api, b'0123456789')
+        stdout = io.BytesIO()
+        with mock.patch('databricks_cli.dbfs.api.click.get_binary_stream', return_value=stdout):
+            dbfs_api.cp(False, False, 'dbfs:/test', '-')
+        assert stdout.getvalue() == b'0123456789'
+
+    def test_cp_stdio_requires_dbfs_path(self, dbfs_api):
+        with mock.patch('databricks_cli.dbfs.api.error_and_quit') as error_and_quit_mock:
+            dbfs_api.cp(False, False, '-', 'local')
+        assert error_and_quit_mock.call_count == 1
+        assert dbfs_api.client.create.call_count == 0
+
+    def test_open_read(self, dbfs_api):
+        self._mock_read_of(dbfs_api, b'0123456789')
+        with dbfs_api.open(TEST_DBFS_PATH) as f:
+            assert f.read() == b'0123456789'
+
+    def test_open_write(self, dbfs_api):
+        dbfs_api.client.create.return_value = {'handle': 0}
+        with dbfs_api.open(TEST_DBFS_PATH, 'wb', overwrite=True) as f:
+            f.write(b'test')
+        body = json.loads(dbfs_api.client.add_block_raw.call_args[0][0].decode())
+        assert body == {'handle': 0, 'data': b64encode(b'test').decode()}
+        assert dbfs_api.client.close.call_count == 1
+
+    def test_open_directory(self, dbfs_api):
+        dbfs_api.client.get_status.return_value = {'path': '/test', 'is_dir': True, 'file_size': 0}
+        with pytest.raises(IOError):
+            dbfs_api.open(TEST_DBFS_PATH)
+
+    def test_cat(self, dbfs_api):
+        contents = b'0123456789abcdefghij'
+        self._mock_read_of(dbfs_api, contents)
+        out = io.BytesIO()
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4):
+            dbfs_api.cat(TEST_DBFS_PATH, out)
+        assert out.getvalue() == contents
+
+    def test_head_reads_only_requested_bytes(self, dbfs_api):
+        self._mock_read_of(dbfs_api, b'0123456789')
+        out = io.BytesIO()
+        dbfs_api.head(TEST_DBFS_PATH, out, 3)
+        assert out.getvalue() == b'012'
+        assert dbfs_api.client.read.call_args_list == [mock.call('dbfs:/test', 0, 3)]
+
+    def test_tail_reads_only_requested_bytes(self, dbfs_api):
+        self._mock_read_of(dbfs_api, b'0123456789')
+        out = io.BytesIO()
+        dbfs_api.tail(TEST_DBFS_PATH, out, 3)
+        assert out.getvalue() == b'789'
+        assert dbfs_api.client.read.call_args_list == [mock.call('dbfs:/test', 7, 3)]
+
+    def test_tail_follow(self, dbfs_api):
+        versions = [b'01234', b'0123456', b'0123456', b'ab']
+        contents = [versions[0]]
+
+        def _get_status(path):
+            return {'path': '/test', 'is_dir': False, 'file_size': len(contents[0])}
+
+        def _read(path, offset, length):
+            data = contents[0][offset:offset + length]
+            return {'bytes_read': len(data), 'data': b64encode(data)}
+
+        def _sleep(seconds):
+            versions.pop(0)
+            if not versions:
+                raise KeyboardInterrupt()
+            contents[0] = versions[0]
+
+        dbfs_api.client.get_status.side_effect = _get_status
+        dbfs_api.client.read.side_effect = _read
+        out = io.BytesIO()
+        with mock.patch('databricks_cli.dbfs.api.time.sleep', side_effect=_sleep), \
+                mock.patch('databricks_cli.dbfs.api.click.echo') as echo_mock:
+            with pytest.raises(KeyboardInterrupt):
+                dbfs_api.tail(TEST_DBFS_PATH, out, 2, follow=True)
+        assert out.getvalue() == b'3456ab'
+        assert 'truncated' in echo_mock.call_args[0][0]
+
+    def test_unknown_io_backend(self):
+        with pytest.raises(ValueError):
+            api.DbfsApi(None, io_backend='direct')
+
+    def test_put_file_mmap(self, dbfs_api, tmpdir):
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with open(test_file_path, 'wb') as f:
+            f.write(b'0123456789')
+
+        dbfs_api.io_backend = api.MMAP_IO
+        dbfs_api.client.create.return_value = {'handle': 0}
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4), \
+                mock.patch('databricks_cli.dbfs.api.SMALL_FILE_THRESHOLD_BYTES', 0):
+            dbfs_api.put_file(test_file_path, TEST_DBFS_PATH, True)
+
+        blocks = [json.loads(ca[0][0].decode())['data']
+                  for ca in dbfs_api.client.add_block_raw.call_args_list]
+        assert blocks == [b64encode(b'0123').decode(), b64encode(b'4567').decode(),
+                          b64encode(b'89').decode()]
+        assert dbfs_api.client.close.call_count == 1
+
+    def test_get_file_ranged_mmap(self, dbfs_api, tmpdir):
+        contents = b'0123456789abcdefghij'
+        self._mock_read_of(dbfs_api, contents)
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        dbfs_api.io_backend = api.MMAP_IO
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4):
+            dbfs_api.get_file(TEST_DBFS_PATH, test_file_path, True, parallelism=3)
+
+        with open(test_file_path, 'rb') as f:
+            assert f.read() == contents
+
+    def test_get_file_ranged_resume(self, dbfs_api, tmpdir):
+        contents = b'0123456789abcdefghij'
+        self._mock_read_of(dbfs_api, contents)
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with open(test_file_path, 'wb') as f:
+            f.write(b'01234567')
+        DownloadCheckpoint(test_file_path, TEST_DBFS_PATH.absolute_path, len(contents)).save(8)
+
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4):
+            dbfs_api.get_file(TEST_DBFS_PATH, test_file_path, False, parallelism=2, resume=True)
+
+        assert sorted(ca[0][1] for ca in dbfs_api.client.read.call_args_list) == [8, 12, 16]
+        with open(test_file_path, 'rb') as f:
+            assert f.read() == contents
+
+    def test_get_file_interrupted_leaves_checkpoint(self, dbfs_api, tmpdir):
+        self._mock_read_of(dbfs_api, b'0123456789')
+        read_side_effect = dbfs_api.client.read.side_effect
+
+        def _read(path, offset, length):
+            if offset >= 4:
+                raise RuntimeError('connection lost')
+            return read_side_effect(path, offset, length)
+
+        dbfs_api.client.read.side_effect = _read
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        with mock.patch('databricks_cli.dbfs.api.BUFFER_SIZE_BYTES', 4):
+            with pytest.raises(RuntimeError):
+                dbfs_api.get_file(TEST_DBFS_PATH, test_file_path, False)
+        checkpoint = DownloadCheckpoint(test_file_path, TEST_DBFS_PATH.absolute_path, 10)
+        assert checkpoint.load_offset() == 4
+
+    def test_copy_to_dbfs_recursive_resume(self, dbfs_api, tmpdir):
+        path = self._make_local_tree(tmpdir)
+        journal = TransferJournal(os.path.abspath(path), 'dbfs:/dst', resume=False)
+        journal.record('dbfs:/dst/a.txt')
+        journal.close(succeeded=False)
+        dbfs_api.client.get_status.side_effect = get_resource_does_not_exist_exception()
+        dbfs_api.cp(True, False, path, 'dbfs:/dst', resume=True)
+
+        put_paths = [ca[0][0] for ca in dbfs_api.client.put.call_args_list]
+        assert sorted(put_paths) == ['dbfs:/dst/b/c.txt', 'dbfs:/dst/b/d/e.txt']
+        assert not os.path.exists(journal.path)
+
+    def test_copy_to_dbfs_recursive_keeps_journal_on_failure(self, dbfs_api, tmpdir):
+        path = self._make_local_tree(tmpdir)
+        dbfs_api.client.get_status.side_effect = get_resource_does_not_exist_exception()
+
+        def _put(dbfs_path, contents, overwrite):
+            if dbfs_path.endswith('c.txt'):
+                raise RuntimeError('boom')
+
+        dbfs_api.client.put.side_effect = _put
+        with pytest.raises(TransferFailedException):
+            dbfs_api.cp(True, False, path, 'dbfs:/dst')
+        with open(TransferJournal.path_for(os.path.abspath(path), 'dbfs:/dst')) as f:
+            assert sorted(f.read().split()) == ['dbfs:/dst/a.txt', 'dbfs:/dst/b/d/e.txt']
+        # The source tree is left untouched.
+        assert sorted(os.listdir(path)) == ['a.txt', 'b']
+
+    def test_walk(self, dbfs_api):
+        listings = {
+            'dbfs:/': [{'path': '/a', 'is_dir': True, 'file_size': 0},
+                       {'path': '/b', 'is_dir': False, 'file_size': 1}],
+            'dbfs:/a': [{'path': '/a/c', 'is_dir': True, 'file_size': 0}],
+            'dbfs:/a/c': [{'path': '/a/c/d', 'is_dir': False, 'file_size': 2}],
+        }
+        dbfs_api.client.list.side_effect = lambda path: {'files': listings[path]}
+        paths = [f.dbfs_path.absolute_path for f in dbfs_api.walk(DbfsPath('dbfs:/'))]
+        assert sorted(paths) == ['dbfs:/a', 'dbfs:/a/c', 'dbfs:/a/c/d', 'dbfs:/b']
+        # Directories come before their children.
+        assert paths.index('dbfs:/a') < paths.index('dbfs:/a/c') < paths.index('dbfs:/a/c/d')
+
+    def test_disk_usage(self, dbfs_api):
+        listings = {
+            'dbfs:/': [{'path': '/a', 'is_dir': True, 'file_size': 0},
+                       {'path': '/b', 'is_dir': False, 'file_size': 1}],
+            'dbfs:/a': [{'path': '/a/c', 'is_dir': True, 'file_size': 0},
+                        {'path': '/a/e', 'is_dir': False, 'file_size': 10}],
+            'dbfs:/a/c': [{'path': '/a/c/d', 'is_dir': False, 'file_size': 100}],
+        }
+        dbfs_api.client.list.side_effect = lambda path: {'files': listings[path]}
+        usages = [(p.absolute_path, size) for p, size in dbfs_api.disk_usage(DbfsPath('dbfs:/'))]
+        assert usages == [('dbfs:/a/c', 100), ('dbfs:/a', 110), ('dbfs:/', 111)]
+
+        usages = [(p.absolute_path, size)
+                  for p, size in dbfs_api.disk_usage(DbfsPath('dbfs:/'), max_depth=0)]
+        assert usages == [('dbfs:/', 111)]
+
+    def test_get_file_with_known_empty_file_info(self, dbfs_api, tmpdir):
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        file_info = api.FileInfo(TEST_DBFS_PATH, False, 0)
+        dbfs_api.get_file(TEST_DBFS_PATH, test_file_path, False, file_info=file_info)
+
+        assert dbfs_api.client.get_status.call_count == 0
+        assert dbfs_api.client.read.call_count == 0
+        assert os.path.getsize(test_file_path) == 0
+
+    def test_get_file_truncated_remotely(self, dbfs_api, tmpdir):
+        dbfs_api.client.read.return_value = {'bytes_read': 0, 'data': ''}
+        test_file_path = os.path.join(tmpdir.strpath, 'test')
+        file_info = api.FileInfo(TEST_DBFS_PATH, False, 10)
+        with pytest.raises(IOError):
+            dbfs_api.get_file(TEST_DBFS_PATH, test_file_path, False, file_info=file_info)
+
+    def test_copy_to_dbfs_recursive_existing_target(self, dbfs_api, tmpdir):
+        path = self._make_local_tree(tmpdir)
+        dbfs_api.client.get_status.return_value = {'path': '/dst', 'is_dir': True, 'file_size': 0}
+        listings = {
+            'dbfs:/dst': [{'path': '/dst/a.txt', 'is_dir': False, 'file_size': 5},
+                          {'path': '/dst/b', 'is_dir': True, 'file_size': 0}],
+            'dbfs:/dst/b': [{'path': '/dst/b/d', 'is_dir': False, 'file_size': 5}],
+        }
+        dbfs_api.client.list.side_effect = lambda p: {'files': listings[p]}
+        dbfs_api.cp(True, False, path, 'dbfs:/dst')
+
+        # a.txt exists and dbfs:/dst/b/d is a file, so only b/c.txt is uploaded and no
+        # directory needs to be created.
+        assert dbfs_api.client.mkdirs.call_count == 0
+        put_paths = [ca[0][0] for ca in dbfs_api.client.put.call_args_list]
+        assert put_paths == ['dbfs:/dst/b/c.txt']
+        assert dbfs_api.client.create.call_count == 0
+
+    def test_copy_to_dbfs_recursive_dry_run(self, dbfs_api, tmpdir):
+        path = self._make_local_tree(tmpdir)
+        dbfs_api.client.get_status.side_effect = get_resource_does_not_exist_exception()
+        dbfs_api.cp(True, False, path, 'dbfs:/dst', dry_run=True)
+
+        assert dbfs_api.client.mkdirs.call_count == 0
+        assert dbfs_api.client.put.call_count == 0
@@ -0,0 +1,46 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from databricks_cli.dbfs.artifacts import ArtifactIndex, artifact_path
+from databricks_cli.dbfs.dbfs_path import DbfsPath
+
+
+def test_artifact_path():
+    path = artifact_path(DbfsPath('dbfs:/artifacts'), 'abc', 'lib-1.0-py3-none-any.whl')
+    assert path == DbfsPath('dbfs:/artifacts/sha256/abc/lib-1.0-py3-none-any.whl')
+
+
+def test_artifact_index_round_trip():
+    index = ArtifactIndex()
+    index.record(DbfsPath('dbfs:/artifacts/sha256/abc/a.jar'), 'abc', 3, 'a.jar')
+    index.record(DbfsPath('dbfs:/artifacts/sha256/abc/b.jar'), 'abc', 3, 'b.jar')
+    index.record(DbfsPath('dbfs:/artifacts/sha256/def/c.jar'), 'def', 4, 'c.jar')
+    loaded = ArtifactIndex.from_json(index.to_json())
+    assert loaded.entries == index.entries
+    assert loaded.paths_for('abc') == ['dbfs:/artifacts/sha256/abc/a.jar',
+                                       'dbfs:/artifacts/sha256/abc/b.jar']
+
+
+def test_artifact_index_ignores_unreadable_index():
+    assert ArtifactIndex.from_json(b'not json').entries == {}
+    assert ArtifactIndex.from_json(b'{"version": 0, "artifacts": {"a": {}}}').entries == {}
@@ -0,0 +1,84 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint:disable=redefined-outer-name
+
+import mock
+import pytest
+from click.testing import CliRunner
+
+import databricks_cli.dbfs.cli as cli
+from databricks_cli.dbfs.api import FileInfo
+from databricks_cli.dbfs.dbfs_path import DbfsPath
+from tests.utils import provide_conf
+
+
+@pytest.fixture()
+def dbfs_api_mock():
+    with mock.patch('databricks_cli.dbfs.cli.DbfsApi') as DbfsApiMock:
+        _dbfs_api_mock = mock.MagicMock()
+        DbfsApiMock.return_value = _dbfs_api_mock
+        yield _dbfs_api_mock
+
+
+@provide_conf
+def test_ls_recursive_cli(dbfs_api_mock):
+    dbfs_api_mock.walk.return_value = iter([
+        FileInfo(DbfsPath('dbfs:/a/b'), True, 0),
+        FileInfo(DbfsPath('dbfs:/a/b/c'), False, 12),
+    ])
+    res = CliRunner().invoke(cli.ls_cli, ['-R', '-l', 'dbfs:/a'])
+    assert dbfs_api_mock.walk.call_args[0][0] == DbfsPath('dbfs:/a')
+    lines = res.output.splitlines()
+    assert lines[0].split() == ['dir', '0', 'b']
+    assert lines[1].split() == ['file', '12', 'b/c']
+
+
+@provide_conf
+def test_du_cli_sort(dbfs_api_mock):
+    dbfs_api_mock.disk_usage.return_value = iter([
+        (DbfsPath('dbfs:/a/b'), 1),
+        (DbfsPath('dbfs:/a/c'), 5),
+        (DbfsPath('dbfs:/a'), 6),
+    ])
+    res = CliRunner().invoke(cli.du_cli, ['--sort', 'dbfs:/a'])
+    assert res.output == '6\tdbfs:/a\n5\tdbfs:/a/c\n1\tdbfs:/a/b\n'
+
+
+@provide_conf
+def test_tail_cli_follow(dbfs_api_mock):
+    res = CliRunner().invoke(cli.tail_cli, ['-c', '10', '-f', '--interval', '0.5', 'dbfs:/log'])
+    assert res.exit_code == 0
+    args = dbfs_api_mock.tail.call_args[0]
+    assert args[0] == DbfsPath('dbfs:/log')
+    assert args[2:] == (10, True, 0.5)
+
+
+@provide_conf
+def test_put_artifact_cli(dbfs_api_mock, tmpdir):
+    path = tmpdir.join('lib.jar')
+    path.write('test')
+    dbfs_api_mock.put_artifact.return_value = DbfsPath('dbfs:/artifacts/sha256/abc/lib.jar')
+    res = CliRunner().invoke(cli.put_artifact_cli, [path.strpath])
+    assert dbfs_api_mock.put_artifact.call_args[0] == (path.strpath, DbfsPath('dbfs:/artifacts'))
+    assert res.output == 'dbfs:/artifacts/sha256/abc/lib.jar\n'
@@ -0,0 +1,75 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from databricks_cli.dbfs.api import FileInfo
+from databricks_cli.dbfs.dbfs_path import DbfsPath
+from databricks_cli.dbfs.plan import UploadPlan, TransferOperation
+
+
+def _remote(*entries):
+    return {path: FileInfo(DbfsPath(path), is_dir, 0) for path, is_dir in entries}
+
+
+def _local_file(tmpdir, name):
+    path = tmpdir.join(name).strpath
+    with open(path, 'w') as f:
+        f.write('test')
+    return path
+
+
+def test_build_creates_only_leaf_directories(tmpdir):
+    dirs = [('src', DbfsPath('dbfs:/dst')),
+            ('src/a', DbfsPath('dbfs:/dst/a')),
+            ('src/a/b', DbfsPath('dbfs:/dst/a/b')),
+            ('src/c', DbfsPath('dbfs:/dst/c'))]
+    plan = UploadPlan.build(dirs, [], _remote(('dbfs:/dst', True), ('dbfs:/dst/c', True)), False)
+    assert [op.dst.absolute_path for op in plan.mkdirs] == ['dbfs:/dst/a/b']
+
+
+def test_build_resolves_conflicts_locally(tmpdir):
+    exists = _local_file(tmpdir, 'exists')
+    new = _local_file(tmpdir, 'new')
+    dirs = [('src', DbfsPath('dbfs:/dst')), ('src/blocked', DbfsPath('dbfs:/dst/blocked'))]
+    files = [(exists, DbfsPath('dbfs:/dst/exists')),
+             (new, DbfsPath('dbfs:/dst/new')),
+             (new, DbfsPath('dbfs:/dst/blocked/new'))]
+    remote = _remote(('dbfs:/dst', True), ('dbfs:/dst/exists', False),
+                     ('dbfs:/dst/blocked', False))
+
+    plan = UploadPlan.build(dirs, files, remote, False)
+    assert [op.dst.absolute_path for op in plan.puts] == ['dbfs:/dst/new']
+    assert sorted(op.dst.absolute_path for op in plan.skips) == ['dbfs:/dst/blocked',
+                                                                 'dbfs:/dst/exists']
+    assert plan.mkdirs == []
+
+    plan = UploadPlan.build(dirs, files, remote, True)
+    assert sorted(op.dst.absolute_path for op in plan.puts) == ['dbfs:/dst/exists',
+                                                                'dbfs:/dst/new']
+    assert plan.puts[0].file_size == os.path.getsize(exists)
+
+
+def test_operation_to_line():
+    op = TransferOperation(TransferOperation.PUT, DbfsPath('dbfs:/dst/a'), 'a')
+    assert op.to_line() == 'put    a -> dbfs:/dst/a'
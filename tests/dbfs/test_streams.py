@@ -0,0 +1,138 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint:disable=redefined-outer-name
+import io
+import json
+import os
+import tarfile
+from base64 import b64encode, b64decode
+
+import mock
+import pytest
+
+from databricks_cli.dbfs.dbfs_path import DbfsPath
+from databricks_cli.dbfs.streams import DbfsReader, DbfsWriter
+
+TEST_DBFS_PATH = DbfsPath('dbfs:/test')
+CONTENTS = b'0123456789abcdefghij'
+
+
+@pytest.fixture()
+def client():
+    _client = mock.MagicMock()
+
+    def _read(path, offset, length):
+        # Return short reads to exercise the refill loop.
+        data = CONTENTS[offset:offset + min(length, 3)]
+        return {'bytes_read': len(data), 'data': b64encode(data)}
+
+    _client.read.side_effect = _read
+    _client.create.return_value = {'handle': 7}
+    return _client
+
+
+def _uploaded(client):
+    blocks = []
+    for ca in client.add_block_raw.call_args_list:
+        body = json.loads(ca[0][0].decode())
+        assert body['handle'] == 7
+        blocks.append(b64decode(body['data']))
+    return blocks
+
+
+def test_reader_reads_sequentially(client):
+    with DbfsReader(client, TEST_DBFS_PATH, len(CONTENTS), block_size=4) as f:
+        assert f.read(6) == b'012345'
+        assert f.read() == b'6789abcdefghij'
+        assert f.read() == b''
+
+
+def test_reader_seek(client):
+    with DbfsReader(client, TEST_DBFS_PATH, len(CONTENTS), block_size=4) as f:
+        f.seek(-3, os.SEEK_END)
+        assert f.read() == b'hij'
+        f.seek(5)
+        assert f.read(2) == b'56'
+        f.seek(1, os.SEEK_CUR)
+        assert f.tell() == 8
+        assert f.read(1) == b'8'
+        with pytest.raises(ValueError):
+            f.seek(-1)
+
+
+def test_reader_only_fetches_readahead_window(client):
+    with DbfsReader(client, TEST_DBFS_PATH, len(CONTENTS), block_size=4, readahead=1) as f:
+        assert f.read(1) == b'0'
+    offsets = set(ca[0][1] for ca in client.read.call_args_list)
+    assert offsets <= set([0, 3, 4, 7])
+
+
+def test_reader_readline(client):
+    with DbfsReader(client, TEST_DBFS_PATH, len(CONTENTS), block_size=4) as f:
+        assert f.readline() == CONTENTS
+
+
+def test_reader_works_with_tarfile(client):
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode='w') as tar:
+        info = tarfile.TarInfo('member')
+        info.size = len(CONTENTS)
+        tar.addfile(info, io.BytesIO(CONTENTS))
+    data = archive.getvalue()
+
+    def _read(path, offset, length):
+        chunk = data[offset:offset + length]
+        return {'bytes_read': len(chunk), 'data': b64encode(chunk)}
+
+    client.read.side_effect = _read
+    with DbfsReader(client, TEST_DBFS_PATH, len(data), block_size=1000) as f:
+        with tarfile.open(fileobj=f, mode='r') as tar:
+            assert tar.extractfile('member').read() == CONTENTS
+
+
+def test_writer_uploads_blocks_in_order(client):
+    with DbfsWriter(client, TEST_DBFS_PATH, overwrite=True, block_size=4) as f:
+        f.write(b'012')
+        f.write(b'3456789')
+    client.create.assert_called_once_with(TEST_DBFS_PATH.absolute_path, True)
+    assert _uploaded(client) == [b'0123', b'4567', b'89']
+    client.close.assert_called_once_with(7)
+
+
+def test_writer_surfaces_upload_errors(client):
+    client.add_block_raw.side_effect = RuntimeError('boom')
+    f = DbfsWriter(client, TEST_DBFS_PATH, block_size=4)
+    f.write(b'0123456789')
+    with pytest.raises(RuntimeError):
+        f.close()
+    assert f.closed
+    assert client.close.call_count == 0
+
+
+def test_writer_aborts_on_exception(client):
+    with pytest.raises(KeyError):
+        with DbfsWriter(client, TEST_DBFS_PATH, block_size=4) as f:
+            f.write(b'0123456789')
+            raise KeyError()
+    assert client.close.call_count == 0
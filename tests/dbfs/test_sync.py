@@ -0,0 +1,85 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+
+import mock
+
+from databricks_cli.dbfs.sync import SyncManifest, hash_file
+
+TEST_DESTINATION = 'dbfs:/dst'
+
+
+def _write(path, contents):
+    with open(path, 'wb') as f:
+        f.write(contents)
+
+
+def test_hash_file(tmpdir):
+    path = tmpdir.join('a').strpath
+    _write(path, b'test')
+    assert hash_file(path) == hashlib.sha256(b'test').hexdigest()
+
+
+def test_manifest_round_trip(tmpdir):
+    path = tmpdir.join('a').strpath
+    _write(path, b'test')
+    manifest_path = tmpdir.join('manifest.json').strpath
+    manifest = SyncManifest.load(manifest_path, TEST_DESTINATION)
+    assert manifest.entries == {}
+    manifest.record('a', path, hash_file(path))
+    manifest.save()
+
+    loaded = SyncManifest.load(manifest_path, TEST_DESTINATION)
+    assert loaded.is_unchanged('a', hashlib.sha256(b'test').hexdigest())
+    # A manifest written for another destination is ignored.
+    assert SyncManifest.load(manifest_path, 'dbfs:/other').entries == {}
+
+
+def test_manifest_path_is_keyed_by_source_and_destination(tmpdir):
+    path = SyncManifest.path_for(tmpdir.strpath, TEST_DESTINATION)
+    assert not path.startswith(tmpdir.strpath)
+    assert path == SyncManifest.path_for(os.path.relpath(tmpdir.strpath), TEST_DESTINATION)
+    assert path != SyncManifest.path_for(tmpdir.strpath, 'dbfs:/other')
+    SyncManifest(path, TEST_DESTINATION).save()
+    assert os.path.isfile(path)
+
+
+def test_manifest_skips_hashing_unmodified_files(tmpdir):
+    path = tmpdir.join('a').strpath
+    _write(path, b'test')
+    manifest = SyncManifest(tmpdir.join('manifest.json').strpath, TEST_DESTINATION)
+    manifest.record('a', path, 'recorded')
+    with mock.patch('databricks_cli.dbfs.sync.hash_file') as hash_file_mock:
+        assert manifest.current_hash('a', path) == 'recorded'
+        assert hash_file_mock.call_count == 0
+        os.utime(path, (0, 0))
+        manifest.current_hash('a', path)
+        assert hash_file_mock.call_count == 1
+
+
+def test_manifest_ignores_corrupt_file(tmpdir):
+    manifest_path = tmpdir.join('manifest.json').strpath
+    _write(manifest_path, b'not json')
+    assert SyncManifest.load(manifest_path, TEST_DESTINATION).entries == {}
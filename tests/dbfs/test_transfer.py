@@ -0,0 +1,286 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+from threading import Lock, Thread
+
+from concurrent.futures import ThreadPoolExecutor
+
+import mock
+import pytest
+
+from databricks_cli.dbfs.transfer import ByteBudget, DownloadCheckpoint, MappedFile, \
+    PositionalFile, SizeAwareScheduler, TransferJournal, crawl, prefetch, report_transfers, \
+    run_in_parallel
+
+
+def test_run_in_parallel_collects_exceptions():
+    def _fn(i):
+        if i == 2:
+            raise ValueError(i)
+        return i * 2
+
+    results = {item: (value, e) for item, value, e in run_in_parallel(_fn, range(4), 2)}
+    assert results[0] == (0, None)
+    assert results[3] == (6, None)
+    assert isinstance(results[2][1], ValueError)
+
+
+def test_crawl():
+    tree = {'/': ['/a', '/b.txt'], '/a': ['/a/c.txt', '/a/d.txt']}
+
+    def _list_dir(directory):
+        if directory == '/broken':
+            raise IOError(directory)
+        return tree[directory]
+
+    def _expand(directory, listing):
+        dirs = [child for child in listing if child in tree] + ['/broken'] * (directory == '/')
+        return dirs, [child for child in listing if child not in tree]
+
+    results = {item: (value, e) for item, value, e in
+               crawl(['/'], _list_dir, _expand, lambda item: item.upper(), 2)}
+    assert sorted(results) == ['/a/c.txt', '/a/d.txt', '/b.txt', '/broken']
+    assert results['/a/c.txt'] == ('/A/C.TXT', None)
+    assert isinstance(results['/broken'][1], IOError)
+
+
+def test_crawl_bounds_submitted_transfers():
+    # Submissions that the crawl has not yielded yet, and the most there ever were.
+    submitted = []
+    outstanding = [0, 0]
+    lock = Lock()
+
+    class _CountingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            with lock:
+                outstanding[0] += 1
+                outstanding[1] = max(outstanding[1], outstanding[0])
+            submitted.append(args)
+            return super(_CountingExecutor, self).submit(fn, *args)
+
+    def _transfer(item):
+        time.sleep(0.001)
+        return item
+
+    with mock.patch('databricks_cli.dbfs.transfer.ThreadPoolExecutor', _CountingExecutor):
+        results = crawl(['/'], lambda directory: None,
+                        lambda directory, listing: ([], range(200)), _transfer, 2)
+        for _ in results:
+            with lock:
+                outstanding[0] -= 1
+    assert len(submitted) == 201
+    # The root listing plus at most 2 * parallelism transfers.
+    assert outstanding[1] <= 5
+
+
+def test_report_transfers():
+    results = [('a', None, None), ('b', None, ValueError('b')), ('c', None, KeyError('c'))]
+
+    def _skip_message(src, dst, e):
+        return 'skip' if isinstance(e, KeyError) else None
+
+    reported = dict(report_transfers(results, 'copy', lambda item: (item, item.upper()),
+                                     _skip_message))
+    assert reported['a'].ok and not reported['a'].skipped
+    assert isinstance(reported['b'].error, ValueError)
+    assert reported['c'].skipped
+    assert reported['c'].dst == 'C'
+
+
+def test_byte_budget_admits_oversized_request():
+    budget = ByteBudget(10)
+    assert budget.acquire(100) == 10
+    budget.release(10)
+    assert budget.in_flight == 0
+
+
+def test_byte_budget_blocks_until_released():
+    budget = ByteBudget(10)
+    budget.acquire(8)
+    acquired = []
+    waiter = Thread(target=lambda: acquired.append(budget.acquire(5)))
+    waiter.start()
+    waiter.join(0.05)
+    assert acquired == []
+    budget.release(8)
+    waiter.join()
+    assert acquired == [5]
+
+
+def test_positional_file(tmpdir):
+    path = tmpdir.join('test').strpath
+    with PositionalFile(path, 6) as f:
+        f.write_at(3, b'def')
+        f.write_at(0, b'abc')
+    with open(path, 'rb') as f:
+        assert f.read() == b'abcdef'
+
+
+def test_mapped_file_write_at(tmpdir):
+    path = tmpdir.join('test').strpath
+    with MappedFile(path, 6) as f:
+        f.write_at(3, b'def')
+        f.write_at(0, b'abc')
+    with open(path, 'rb') as f:
+        assert f.read() == b'abcdef'
+
+
+def test_mapped_file_blocks(tmpdir):
+    path = tmpdir.join('test').strpath
+    with open(path, 'wb') as f:
+        f.write(b'0123456789')
+    with MappedFile(path) as f:
+        assert [bytes(block) for block in f.blocks(4)] == [b'0123', b'4567', b'89']
+        assert [bytes(block) for block in f.blocks(4, start=8)] == [b'89']
+
+
+def test_mapped_file_empty(tmpdir):
+    path = tmpdir.join('test').strpath
+    open(path, 'wb').close()
+    with MappedFile(path) as f:
+        assert list(f.blocks(4)) == []
+
+
+def test_prefetch_yields_in_order():
+    assert list(prefetch(iter(range(10)), 2)) == list(range(10))
+
+
+def test_prefetch_reraises_producer_errors():
+    def _produce():
+        yield 1
+        raise ValueError('boom')
+
+    items = prefetch(_produce(), 2)
+    assert next(items) == 1
+    with pytest.raises(ValueError):
+        next(items)
+
+
+def test_prefetch_close_closes_source():
+    closed = []
+
+    def _produce():
+        try:
+            for i in range(100):
+                yield i
+        finally:
+            closed.append(True)
+
+    items = prefetch(_produce(), 2)
+    assert next(items) == 0
+    items.close()
+    assert closed == [True]
+
+
+def test_download_checkpoint(tmpdir):
+    dst_path = tmpdir.join('test').strpath
+    checkpoint = DownloadCheckpoint(dst_path, 'dbfs:/test', 10)
+    assert checkpoint.load_offset() == 0
+    with open(dst_path, 'wb') as f:
+        f.write(b'012345')
+    checkpoint.save(8)
+    assert DownloadCheckpoint.exists_for(dst_path)
+    # Never resume past what was actually written locally.
+    assert checkpoint.load_offset() == 6
+    # A checkpoint for another source or size is ignored.
+    assert DownloadCheckpoint(dst_path, 'dbfs:/other', 10).load_offset() == 0
+    assert DownloadCheckpoint(dst_path, 'dbfs:/test', 11).load_offset() == 0
+    checkpoint.remove()
+    assert not DownloadCheckpoint.exists_for(dst_path)
+
+
+def test_transfer_journal():
+    journal = TransferJournal('/src', 'dbfs:/dst', resume=False)
+    # Nothing is written until a file completes.
+    assert not os.path.exists(journal.path)
+    journal.record('dbfs:/dst/a')
+    journal.close(succeeded=False)
+    assert TransferJournal.path_for('/src', 'dbfs:/dst') == journal.path
+    assert TransferJournal.path_for('/other', 'dbfs:/dst') != journal.path
+
+    resumed = TransferJournal('/src', 'dbfs:/dst', resume=True)
+    assert resumed.is_completed('dbfs:/dst/a')
+    resumed.close(succeeded=True)
+    assert not os.path.exists(journal.path)
+
+    # Without resume, an existing journal is discarded.
+    TransferJournal('/src', 'dbfs:/dst', resume=False).record('dbfs:/dst/a')
+    TransferJournal('/src', 'dbfs:/dst', resume=False).close(succeeded=False)
+    assert not TransferJournal('/src', 'dbfs:/dst', resume=True).is_completed('dbfs:/dst/a')
+
+
+def test_transfer_journal_unwritable():
+    journal = TransferJournal('/src', 'dbfs:/dst', resume=False)
+    with mock.patch('databricks_cli.dbfs.transfer.open', create=True,
+                    side_effect=IOError('read-only')):
+        journal.record('dbfs:/dst/a')
+        journal.record('dbfs:/dst/b')
+    journal.close(succeeded=False)
+    assert not os.path.exists(journal.path)
+
+
+def test_size_aware_scheduler_orders_large_items_first():
+    sizes = {'huge': 100, 'big': 50, 's1': 1, 's2': 1, 's3': 1}
+    started = []
+
+    def _fn(item):
+        started.append(item)
+        return sizes[item]
+
+    scheduler = SizeAwareScheduler(1, sizes.get, small_item_bytes=10, batch_items=2)
+    results = {item: (value, e) for item, value, e in scheduler.run(_fn, list(sizes))}
+    assert results['huge'] == (100, None)
+    # Large items largest first, with a batch of small items after each one.
+    assert started[0] == 'huge'
+    assert started[3] == 'big'
+    assert set(started[1:3]) | set(started[4:]) == {'s1', 's2', 's3'}
+
+    summary = scheduler.summary
+    assert summary.num_items == 5
+    assert summary.total_bytes == 153
+    assert 0 <= summary.utilization <= 1
+
+
+def test_size_aware_scheduler_collects_exceptions():
+    def _fn(item):
+        if item == 2:
+            raise ValueError(item)
+        return item
+
+    scheduler = SizeAwareScheduler(3, lambda item: item)
+    results = {item: (value, e) for item, value, e in scheduler.run(_fn, range(5))}
+    assert len(results) == 5
+    assert isinstance(results[2][1], ValueError)
+    assert results[4] == (4, None)
+
+
+def test_size_aware_scheduler_keeps_slow_workers_off_large_items():
+    scheduler = SizeAwareScheduler(2, lambda item: item, small_item_bytes=10, batch_items=1)
+    scheduler._prepare([100, 50, 1, 1])
+    scheduler.summary.busy_times = [10.0, 1.0]
+    scheduler._bytes_done = [10, 100]
+    # Worker 0 moves 1 byte/s against worker 1's 100 bytes/s.
+    assert scheduler._next_job(0) == [(1, 1)]
+    assert scheduler._next_job(1) == [(100, 100)]
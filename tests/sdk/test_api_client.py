@@ -21,7 +21,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from databricks_cli.sdk.api_client import ApiClient
+# pylint:disable=redefined-outer-name
+
+import mock
+import pytest
+import requests
+
+from databricks_cli.sdk.api_client import ApiClient, RetryPolicy
 
 
 def test_api_client_constructor():
@@ -29,3 +35,92 @@ def test_api_client_constructor():
     client = ApiClient(user='apple', password='banana', host='https://databricks.com')
     # echo -n "apple:banana" | base64
     assert client.default_headers['Authorization'] == 'Basic YXBwbGU6YmFuYW5h'
+
+
+def _response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b'{}'
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture()
+def sleep_mock():
+    with mock.patch('databricks_cli.sdk.api_client.time.sleep') as _sleep_mock:
+        yield _sleep_mock
+
+
+def test_perform_query_retries_throttled_requests(sleep_mock):
+    client = ApiClient(token='token', host='https://databricks.com')
+    client.session.request = mock.Mock(side_effect=[
+        _response(429, {'Retry-After': '7'}),
+        _response(200)
+    ])
+    assert client.perform_query('POST', '/dbfs/mkdirs', {'path': '/test'}) == {}
+    assert client.session.request.call_count == 2
+    assert sleep_mock.call_args[0][0] >= 7
+
+
+def test_perform_query_gives_up_on_long_retry_after(sleep_mock):
+    client = ApiClient(token='token', host='https://databricks.com')
+    client.session.request = mock.Mock(return_value=_response(429, {'Retry-After': '86400'}))
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.perform_query('POST', '/dbfs/mkdirs', {'path': '/test'})
+    assert client.session.request.call_count == 1
+    assert sleep_mock.call_count == 0
+
+
+def test_perform_query_does_not_retry_non_idempotent(sleep_mock):
+    client = ApiClient(token='token', host='https://databricks.com')
+    client.session.request = mock.Mock(return_value=_response(503))
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.perform_query('POST', '/dbfs/add-block', {'handle': 1})
+    assert client.session.request.call_count == 1
+    assert sleep_mock.call_count == 0
+
+
+def test_perform_query_sends_serialized_body():
+    client = ApiClient(token='token', host='https://databricks.com')
+    client.session.request = mock.Mock(return_value=_response(200))
+    body = b'{"handle": 1, "data": "dGVzdA=="}'
+    assert client.perform_query('POST', '/dbfs/add-block', body=body) == {}
+    assert client.session.request.call_args[1]['data'] is body
+
+
+def test_perform_query_retries_connection_errors(sleep_mock):
+    client = ApiClient(token='token', host='https://databricks.com')
+    client.session.request = mock.Mock(side_effect=[
+        requests.exceptions.ConnectionError(),
+        _response(503),
+        _response(200)
+    ])
+    assert client.perform_query('GET', '/dbfs/read', {'path': '/test'}) == {}
+    assert client.session.request.call_count == 3
+    assert sleep_mock.call_count == 2
+
+
+def test_perform_query_gives_up_after_max_retries(sleep_mock):
+    client = ApiClient(token='token', host='https://databricks.com',
+                       retry_policy=RetryPolicy(max_retries=2))
+    client.session.request = mock.Mock(return_value=_response(503))
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.perform_query('GET', '/dbfs/get-status', {'path': '/test'})
+    assert client.session.request.call_count == 3
+    assert sleep_mock.call_count == 2
+
+
+def test_retry_policy_parse_retry_after():
+    assert RetryPolicy.parse_retry_after(None) is None
+    assert RetryPolicy.parse_retry_after('3') == 3
+    assert RetryPolicy.parse_retry_after('garbage') is None
+    assert RetryPolicy.parse_retry_after('inf') is None
+    assert RetryPolicy.parse_retry_after('nan') is None
+    assert RetryPolicy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+
+
+def test_retry_policy_backoff_is_bounded():
+    policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+    for attempt in range(10):
+        assert 0 <= policy.get_backoff(attempt) <= 5
+    assert policy.get_backoff(10, retry_after=30) == 30
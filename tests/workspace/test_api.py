@@ -21,13 +21,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
+import io
+
 import mock
-from base64 import b64encode
+from base64 import b64decode, b64encode
 
 import pytest
+import requests
 
 import databricks_cli.workspace.api as api
+from databricks_cli.dbfs.exceptions import TransferFailedException
+from databricks_cli.dbfs.sync import SyncManifest
 from databricks_cli.workspace.api import WorkspaceFileInfo
+from databricks_cli.workspace.dbc import DbcWriter, read_dbc
 from databricks_cli.workspace.types import WorkspaceLanguage
 
 TEST_WORKSPACE_PATH = '/test/workspace/path'
@@ -265,6 +271,24 @@ class TestWorkspaceApi(object):
         assert any([ca[0][1] == '/a/test-py'
                     for ca in workspace_api.import_workspace.call_args_list])
 
+    def test_import_dir_follows_symlinks(self, workspace_api, tmpdir):
+        """
+        Copy from directory ``src`` with structure as follows
+        - linked (symlink to ``notebooks``)
+          - n.py (python)
+        """
+        workspace_api.import_workspace = mock.MagicMock()
+        workspace_api.mkdirs = mock.MagicMock()
+        os.makedirs(os.path.join(tmpdir.strpath, 'notebooks'))
+        os.makedirs(os.path.join(tmpdir.strpath, 'src'))
+        with open(os.path.join(tmpdir.strpath, 'notebooks', 'n.py'), 'wt'):
+            pass
+        os.symlink(os.path.join(tmpdir.strpath, 'notebooks'),
+                   os.path.join(tmpdir.strpath, 'src', 'linked'))
+        workspace_api.import_workspace_dir(os.path.join(tmpdir.strpath, 'src'), '/t', False, False)
+        assert [ca[0][1] for ca in workspace_api.import_workspace.call_args_list] == \
+            ['/t/linked/n']
+
     def test_import_dir_hidden(self, workspace_api, tmpdir):
         """
         Copy from directory ``tmpdir`` with structure as follows
@@ -293,3 +317,178 @@ class TestWorkspaceApi(object):
                     for ca in workspace_api.import_workspace.call_args_list])
         assert any([ca[0][1] == '/a/test-py'
                     for ca in workspace_api.import_workspace.call_args_list])
+
+    def test_import_workspace_dir_parallel(self, workspace_api, tmpdir):
+        workspace_api.mkdirs = mock.MagicMock()
+        workspace_api.import_workspace = mock.MagicMock()
+        os.makedirs(os.path.join(tmpdir.strpath, 'a', 'b', 'c'))
+        os.makedirs(os.path.join(tmpdir.strpath, 'd'))
+        for name in ['x.py', 'y.scala', 'z.sql']:
+            with open(os.path.join(tmpdir.strpath, 'a', name), 'wt') as f:
+                f.write('1')
+        with open(os.path.join(tmpdir.strpath, 'a', 'b', 'readme.txt'), 'wt') as f:
+            f.write('not a notebook')
+
+        summary = workspace_api.import_workspace_dir(tmpdir.strpath, '/t', False, False,
+                                                     parallelism=4)
+
+        # Directories are created shallowest first.
+        depths = [ca[0][0].count('/') for ca in workspace_api.mkdirs.call_args_list]
+        assert depths == sorted(depths)
+        assert sorted(ca[0][0] for ca in workspace_api.mkdirs.call_args_list) == \
+            ['/t', '/t/a', '/t/a/b', '/t/a/b/c', '/t/d']
+        assert sorted(ca[0][1] for ca in workspace_api.import_workspace.call_args_list) == \
+            ['/t/a/x', '/t/a/y', '/t/a/z']
+        assert len(summary.transferred) == 3
+        assert len(summary.skipped) == 1
+        assert str(summary) == 'Imported 3 files, skipped 1, 0 failed.'
+
+    def test_import_workspace_dir_reports_failures(self, workspace_api, tmpdir):
+        workspace_api.mkdirs = mock.MagicMock()
+
+        def _import(source_path, target_path, language, fmt, is_overwrite):
+            if target_path == '/t/a':
+                raise RuntimeError('boom')
+
+        workspace_api.import_workspace = mock.MagicMock(side_effect=_import)
+        for name in ['a.py', 'b.py']:
+            with open(os.path.join(tmpdir.strpath, name), 'wt') as f:
+                f.write('1')
+
+        with pytest.raises(TransferFailedException) as e:
+            workspace_api.import_workspace_dir(tmpdir.strpath, '/t', False, False, parallelism=2)
+        assert [f.dst for f in e.value.failures] == ['/t/a']
+        assert workspace_api.import_workspace.call_count == 2
+
+    def test_export_workspace_dir_parallel(self, workspace_api, tmpdir):
+        def _list(path):
+            if path == '/t':
+                return {'objects': [
+                    {'path': '/t/a', 'object_type': api.NOTEBOOK, 'language': 'PYTHON'},
+                    {'path': '/t/b', 'object_type': api.DIRECTORY},
+                    {'path': '/t/lib', 'object_type': api.LIBRARY},
+                ]}
+            elif path == '/t/b':
+                return {'objects': [
+                    {'path': '/t/b/c', 'object_type': api.NOTEBOOK, 'language': 'SCALA'},
+                    {'path': '/t/b/d', 'object_type': api.NOTEBOOK, 'language': 'SQL'},
+                ]}
+            assert False, 'Unexpected listing of {}'.format(path)
+
+        def _export(path, fmt):
+            if path == '/t/b/d':
+                raise RuntimeError('boom')
+            return {'content': b64encode(path.encode())}
+
+        workspace_api.client.list.side_effect = _list
+        workspace_api.client.export_workspace.side_effect = _export
+        with pytest.raises(TransferFailedException) as e:
+            workspace_api.export_workspace_dir('/t', tmpdir.strpath, False, parallelism=4)
+
+        assert [f.src for f in e.value.failures] == ['/t/b/d']
+        with open(os.path.join(tmpdir.strpath, 'a.py')) as f:
+            assert f.read() == '/t/a'
+        with open(os.path.join(tmpdir.strpath, 'b', 'c.scala')) as f:
+            assert f.read() == '/t/b/c'
+
+    def test_import_dir_prints_schedule_summary(self, workspace_api, tmpdir, capsys):
+        with open(os.path.join(tmpdir.strpath, 'x.py'), 'wt') as f:
+            f.write('1')
+        workspace_api.import_workspace_dir(tmpdir.strpath, '/t', False, False, parallelism=2)
+        assert '1 items' in capsys.readouterr().out
+
+    def test_sync_workspace_dir(self, workspace_api, tmpdir):
+        os.makedirs(os.path.join(tmpdir.strpath, 'a'))
+        with open(os.path.join(tmpdir.strpath, 'a', 'x.py'), 'wt') as f:
+            f.write('1')
+        with open(os.path.join(tmpdir.strpath, 'y.scala'), 'wt') as f:
+            f.write('2')
+
+        workspace_api.sync_workspace_dir(tmpdir.strpath, '/t', delete=True)
+        imported = sorted(ca[0] for ca in workspace_api.client.import_workspace.call_args_list)
+        assert [(path, language) for path, _, language, _, _ in imported] == \
+            [('/t/a/x', WorkspaceLanguage.PYTHON), ('/t/y', WorkspaceLanguage.SCALA)]
+        assert os.path.isfile(SyncManifest.path_for(tmpdir.strpath, '/t'))
+        assert sorted(os.listdir(tmpdir.strpath)) == ['a', 'y.scala']
+
+        # Nothing changed, so nothing is imported again.
+        workspace_api.client.import_workspace.reset_mock()
+        workspace_api.sync_workspace_dir(tmpdir.strpath, '/t', delete=True)
+        assert workspace_api.client.import_workspace.call_count == 0
+
+        # Only the changed notebook is imported and the removed one is deleted.
+        with open(os.path.join(tmpdir.strpath, 'a', 'x.py'), 'wt') as f:
+            f.write('3')
+        os.remove(os.path.join(tmpdir.strpath, 'y.scala'))
+        workspace_api.sync_workspace_dir(tmpdir.strpath, '/t', delete=True)
+        assert [ca[0][0] for ca in workspace_api.client.import_workspace.call_args_list] == \
+            ['/t/a/x']
+        assert workspace_api.client.import_workspace.call_args[0][4] is True
+        workspace_api.client.delete.assert_called_once_with('/t/y', False)
+
+    def test_sync_workspace_dir_keeps_failed_imports_pending(self, workspace_api, tmpdir):
+        with open(os.path.join(tmpdir.strpath, 'x.py'), 'wt') as f:
+            f.write('1')
+        workspace_api.client.import_workspace.side_effect = RuntimeError('boom')
+        with pytest.raises(TransferFailedException):
+            workspace_api.sync_workspace_dir(tmpdir.strpath, '/t')
+
+        workspace_api.client.import_workspace.side_effect = None
+        workspace_api.sync_workspace_dir(tmpdir.strpath, '/t')
+        assert workspace_api.client.import_workspace.call_count == 2
+
+    def test_export_workspace_dir_bulk(self, workspace_api, tmpdir):
+        archive = io.BytesIO()
+        with DbcWriter(archive) as dbc:
+            dbc.add_notebook('proj/a', WorkspaceLanguage.PYTHON, 'print(1)\n')
+            dbc.add_notebook('proj/sub/b', WorkspaceLanguage.SQL, 'select 1\n')
+        workspace_api.client.export_workspace.return_value = {
+            'content': b64encode(archive.getvalue())}
+        summary = workspace_api.export_workspace_dir_bulk('/Users/x/proj', tmpdir.strpath, False)
+
+        workspace_api.client.export_workspace.assert_called_once_with('/Users/x/proj', 'DBC')
+        assert len(summary.transferred) == 2
+        with open(os.path.join(tmpdir.strpath, 'a.py')) as f:
+            assert f.read() == '# Databricks notebook source\nprint(1)\n'
+        with open(os.path.join(tmpdir.strpath, 'sub', 'b.sql')) as f:
+            assert f.read() == '-- Databricks notebook source\nselect 1\n'
+
+    def test_export_workspace_dir_bulk_falls_back(self, workspace_api, tmpdir):
+        workspace_api.client.export_workspace.side_effect = requests.exceptions.HTTPError()
+        workspace_api.export_workspace_dir = mock.MagicMock()
+        workspace_api.export_workspace_dir_bulk('/proj', tmpdir.strpath, False, parallelism=4)
+        workspace_api.export_workspace_dir.assert_called_once_with('/proj', tmpdir.strpath,
+                                                                   False, 4)
+
+    def test_import_workspace_dir_bulk(self, workspace_api, tmpdir):
+        os.makedirs(os.path.join(tmpdir.strpath, 'sub'))
+        with open(os.path.join(tmpdir.strpath, 'a.py'), 'wt') as f:
+            f.write('print(1)\n')
+        with open(os.path.join(tmpdir.strpath, 'sub', 'b.scala'), 'wt') as f:
+            f.write('println(1)\n')
+        with open(os.path.join(tmpdir.strpath, 'sub', 'c.ipynb'), 'wt') as f:
+            f.write('{}')
+        summary = workspace_api.import_workspace_dir_bulk(tmpdir.strpath, '/Users/x/proj', False)
+
+        calls = workspace_api.client.import_workspace.call_args_list
+        assert len(calls) == 2
+        assert calls[0][0][:2] == ('/Users/x/proj', 'DBC')
+        notebooks = sorted(read_dbc(b64decode(calls[0][0][3]), 'proj'))
+        assert [(path, language) for path, language, _ in notebooks] == \
+            [('a', WorkspaceLanguage.PYTHON), ('sub/b', WorkspaceLanguage.SCALA)]
+        assert calls[1][0][:2] == ('/Users/x/proj/sub/c', 'JUPYTER')
+        assert len(summary.transferred) == 3
+
+    def test_import_workspace_dir_bulk_falls_back(self, workspace_api, tmpdir):
+        with open(os.path.join(tmpdir.strpath, 'a.py'), 'wt') as f:
+            f.write('print(1)\n')
+
+        def _import(path, fmt, *args):
+            if fmt == 'DBC':
+                raise requests.exceptions.HTTPError()
+        workspace_api.client.import_workspace.side_effect = _import
+        summary = workspace_api.import_workspace_dir_bulk(tmpdir.strpath, '/proj', False)
+
+        assert [ca[0][:2] for ca in workspace_api.client.import_workspace.call_args_list] == \
+            [('/proj', 'DBC'), ('/proj/a', 'SOURCE')]
+        assert len(summary.transferred) == 1
@@ -27,6 +27,7 @@ import pytest
 from click.testing import CliRunner
 
 import databricks_cli.workspace.cli as cli
+from databricks_cli.dbfs.transfer import DEFAULT_PARALLELISM
 from databricks_cli.workspace.api import WorkspaceFileInfo, NOTEBOOK
 from databricks_cli.workspace.types import WorkspaceLanguage
 from tests.utils import provide_conf
@@ -49,3 +50,30 @@ def test_export_workspace_cli(workspace_api_mock, tmpdir):
     runner.invoke(cli.export_workspace_cli, ['--format', 'SOURCE', '/notebook-name', path])
     assert workspace_api_mock.export_workspace.call_args[0][1] == os.path.join(
         path, 'notebook-name.scala')
+
+
+@provide_conf
+def test_import_dir_cli_parallelism(workspace_api_mock, tmpdir):
+    runner = CliRunner()
+    runner.invoke(cli.import_dir_cli, ['-p', '8', tmpdir.strpath, '/target'])
+    assert workspace_api_mock.import_workspace_dir.call_args[0] == \
+        (tmpdir.strpath, '/target', False, False, 8)
+
+
+@provide_conf
+def test_import_dir_cli_bulk(workspace_api_mock, tmpdir):
+    runner = CliRunner()
+    runner.invoke(cli.import_dir_cli, ['--bulk', tmpdir.strpath, '/target'])
+    assert workspace_api_mock.import_workspace_dir_bulk.call_args[0] == \
+        (tmpdir.strpath, '/target', False, DEFAULT_PARALLELISM)
+    result = runner.invoke(cli.import_dir_cli, ['--bulk', '-o', tmpdir.strpath, '/target'])
+    assert result.exit_code != 0
+    assert workspace_api_mock.import_workspace_dir_bulk.call_count == 1
+
+
+@provide_conf
+def test_export_dir_cli_parallelism(workspace_api_mock, tmpdir):
+    runner = CliRunner()
+    runner.invoke(cli.export_dir_cli, ['-p', '8', '/source', tmpdir.strpath])
+    assert workspace_api_mock.export_workspace_dir.call_args[0] == \
+        ('/source', tmpdir.strpath, False, 8)
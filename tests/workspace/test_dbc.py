@@ -0,0 +1,135 @@
+# Databricks CLI
+# Copyright 2017 Databricks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"), except
+# that the use of services to which certain application programming
+# interfaces (each, an "API") connect requires that the user first obtain
+# a license for the use of the APIs from Databricks, Inc. ("Databricks"),
+# by creating an account at www.databricks.com and agreeing to either (a)
+# the Community Edition Terms of Service, (b) the Databricks Terms of
+# Service, or (c) another written agreement between Licensee and Databricks
+# for the use of the APIs.
+#
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import zipfile
+
+from databricks_cli.workspace.dbc import DbcWriter, notebook_to_source, read_dbc, \
+    source_to_notebook
+from databricks_cli.workspace.types import WorkspaceLanguage
+
+TEST_NOTEBOOK = {
+    'name': 'a',
+    'language': 'python',
+    'commands': [
+        {'position': 2.0, 'command': '%md\n# Title\n\nText'},
+        {'position': 1.0, 'command': 'print(1)'},
+    ]
+}
+
+
+def make_dbc(entries):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as z:
+        for name, notebook in entries.items():
+            z.writestr(name, json.dumps(notebook))
+    return archive.getvalue()
+
+
+def test_notebook_to_source():
+    assert notebook_to_source(TEST_NOTEBOOK, WorkspaceLanguage.PYTHON) == (
+        '# Databricks notebook source\n'
+        'print(1)\n'
+        '\n'
+        '# COMMAND ----------\n'
+        '\n'
+        '# MAGIC %md\n'
+        '# MAGIC # Title\n'
+        '# MAGIC\n'
+        '# MAGIC Text\n')
+
+
+def test_notebook_to_source_scala():
+    notebook = {'commands': [{'command': 'println(1)'}, {'command': 'println(2)'}]}
+    assert notebook_to_source(notebook, WorkspaceLanguage.SCALA) == \
+        '// Databricks notebook source\nprintln(1)\n\n// COMMAND ----------\n\nprintln(2)\n'
+
+
+def test_notebook_to_source_titles():
+    notebook = {'commands': [
+        {'command': 'print(1)', 'commandTitle': 'Shown', 'showCommandTitle': True},
+        {'command': '%md\nText', 'commandTitle': 'Hidden', 'showCommandTitle': False},
+        {'command': 'print(2)', 'commandTitle': ''},
+    ]}
+    assert notebook_to_source(notebook, WorkspaceLanguage.PYTHON) == (
+        '# Databricks notebook source\n'
+        '# DBTITLE 1,Shown\n'
+        'print(1)\n'
+        '\n'
+        '# COMMAND ----------\n'
+        '\n'
+        '# DBTITLE 0,Hidden\n'
+        '# MAGIC %md\n'
+        '# MAGIC Text\n'
+        '\n'
+        '# COMMAND ----------\n'
+        '\n'
+        'print(2)\n')
+    assert notebook_to_source({'commands': [notebook['commands'][0]]}, WorkspaceLanguage.SQL) \
+        .startswith('-- Databricks notebook source\n-- DBTITLE 1,Shown\n')
+
+
+def test_read_dbc():
+    content = make_dbc({
+        'proj/a.python': TEST_NOTEBOOK,
+        'proj/sub/b.scala': {'commands': [{'command': 'println(1)'}]},
+        'proj/../escape.python': TEST_NOTEBOOK,
+        'proj/resource.json': {},
+    })
+    notebooks = sorted(read_dbc(content, 'proj'))
+    assert [(path, language) for path, language, _ in notebooks] == \
+        [('a', WorkspaceLanguage.PYTHON), ('sub/b', WorkspaceLanguage.SCALA)]
+
+
+def test_source_to_notebook_round_trip():
+    source = notebook_to_source(TEST_NOTEBOOK, WorkspaceLanguage.PYTHON)
+    notebook = source_to_notebook(source, 'a', WorkspaceLanguage.PYTHON)
+    assert notebook['language'] == 'python'
+    assert [c['command'] for c in notebook['commands']] == ['print(1)', '%md\n# Title\n\nText']
+    assert [c['position'] for c in notebook['commands']] == [1, 2]
+    assert notebook_to_source(notebook, WorkspaceLanguage.PYTHON) == source
+
+    titled = {'commands': [
+        {'command': 'select 1', 'commandTitle': 'Shown, with a comma', 'showCommandTitle': True},
+        {'command': '%md\nText', 'commandTitle': 'Hidden', 'showCommandTitle': False},
+        {'command': 'select 2'},
+    ]}
+    source = notebook_to_source(titled, WorkspaceLanguage.SQL)
+    notebook = source_to_notebook(source, 'a', WorkspaceLanguage.SQL)
+    assert [(c['command'], c.get('commandTitle'), c.get('showCommandTitle'))
+            for c in notebook['commands']] == [('select 1', 'Shown, with a comma', True),
+                                               ('%md\nText', 'Hidden', False),
+                                               ('select 2', None, None)]
+    assert notebook_to_source(notebook, WorkspaceLanguage.SQL) == source
+
+
+def test_dbc_writer():
+    archive = io.BytesIO()
+    with DbcWriter(archive) as dbc:
+        dbc.add_notebook('proj/a', WorkspaceLanguage.PYTHON, '# Databricks notebook source\nx\n')
+        dbc.add_notebook('proj/sub/b', WorkspaceLanguage.SQL, 'select 1\n')
+    assert sorted(read_dbc(archive.getvalue(), 'proj')) == [
+        ('a', WorkspaceLanguage.PYTHON, '# Databricks notebook source\nx\n'),
+        ('sub/b', WorkspaceLanguage.SQL, '-- Databricks notebook source\nselect 1\n'),
+    ]